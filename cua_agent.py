@@ -1,16 +1,217 @@
+import argparse
 import asyncio
+import atexit
+import hashlib
 import logging
 import json
-from typing import Dict, List
-from urllib.parse import urlparse
+import os
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from cua_tools import generate_functional_tests, generate_nfr_tests
+from cua_tools import close_browser_pool, generate_functional_tests, generate_nfr_tests, get_cached_elements, validate_url
+from llm_provider import get_llm_provider
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    force=True
-)
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and unavailable on Windows)
+    uvloop = None
+
+# On-disk cache of generated tests, keyed by generator, URL and business context.
+# Bump PROMPT_VERSION whenever the prompts change to invalidate old entries.
+CACHE_DIR = Path(".cua_cache")
+PROMPT_VERSION = "4"
+
+# Disabled with CUA_NO_CACHE=1 or the --no-cache flag
+cache_disabled = os.getenv("CUA_NO_CACHE", "").lower() in ("1", "true", "yes")
+
+DEFAULT_BUSINESS_CONTEXT = "Web application under test"
+DEFAULT_OUTPUT_FILE = "generated_tests.json"
+
+# serialize_tests() output for a suite with no tests, pre-rendered
+EMPTY_SUITE_JSON = b'{"functional_tests":[],"nfr_tests":[]}'
+EMPTY_SUITE_JSON_PRETTY = b'{\n  "functional_tests": [],\n  "nfr_tests": []\n}'
+
+# Keys every generated test must carry
+REQUIRED_FUNCTIONAL_KEYS = frozenset(("id", "title", "steps", "expected_result"))
+REQUIRED_NFR_KEYS = frozenset(("id", "category", "title", "acceptance_criteria"))
+
+# Sites known to require HTTPS; plain-HTTP URLs to them are upgraded
+FORCE_HTTPS_SITES = frozenset((
+    'google.com',
+    'facebook.com',
+    'twitter.com',
+    'github.com',
+    'linkedin.com',
+    'microsoft.com'
+))
+
+# Delimiters ending the authority and path components of a URL
+_URL_AUTHORITY_END = re.compile(r'[/?#]')
+_URL_PATH_END = re.compile(r'[?#]')
+
+# In-process cache so repeated URLs within one run skip disk reads as well
+_memory_cache: Dict[str, List[Dict]] = {}
+
+logger = logging.getLogger(__name__)
+
+# Set once the root logger has been configured by configure_logging()
+_log_configured = False
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Configure root logging for the CLI; later calls are no-ops."""
+    global _log_configured
+    if _log_configured:
+        return
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    _log_configured = True
+
+
+def serialize_tests(tests: Dict, pretty: bool = False) -> bytes:
+    """
+    Serialize a test suite to UTF-8 JSON bytes.
+    
+    Uses orjson when available and falls back to the stdlib json module.
+    Output is compact by default, which is faster to encode and smaller for
+    machine consumers; pass pretty=True for 2-space indentation.
+    
+    Args:
+        tests: Test suite dictionary to serialize
+        pretty: Indent the output for human readers
+    
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(tests, option=option)
+    if pretty:
+        return json.dumps(tests, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(tests, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def write_bytes(path: str, payload: bytes) -> None:
+    """
+    Write a pre-serialized payload to path with raw os-level calls.
+    
+    Bypasses Python's buffered file object since the payload is already
+    fully rendered in memory.
+    
+    Args:
+        path: Output file path (created or truncated)
+        payload: Bytes to write
+    
+    Raises:
+        OSError: If the file cannot be opened or written
+    """
+    # O_BINARY (Windows only) stops newline translation in the --pretty output
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _cache_key(fn: Callable, url: str, business_context: str) -> str:
+    """Cache key for fn's results: generator, inputs, prompt version, provider and model."""
+    llm = get_llm_provider()
+    return hashlib.sha256(
+        f"{fn.__name__}|{url}|{business_context}|{PROMPT_VERSION}|{llm.provider_name}|{llm.model}".encode('utf-8')
+    ).hexdigest()
+
+
+def cache_lookup(fn: Callable, url: str, business_context: str) -> Optional[List[Dict]]:
+    """
+    Return fn's cached results from memory or CACHE_DIR without generating.
+    
+    Args:
+        fn: Async test generator, e.g. generate_functional_tests
+        url: URL passed to the generator
+        business_context: Business context passed to the generator
+    
+    Returns:
+        Cached list of test dictionaries, or None on a miss (or with caching disabled)
+    """
+    if cache_disabled:
+        return None
+    
+    key = _cache_key(fn, url, business_context)
+    if key in _memory_cache:
+        return _memory_cache[key]
+    
+    cache_file = CACHE_DIR / f"{key}.json"
+    if cache_file.exists():
+        try:
+            raw = cache_file.read_bytes()
+            result = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            logger.info("Loaded %s results from cache: %s", fn.__name__, cache_file)
+            _memory_cache[key] = result
+            return result
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache file %s: %s", cache_file, e)
+    return None
+
+
+async def cached(
+    fn: Callable[[str, str], Awaitable[List[Dict]]],
+    url: str,
+    business_context: str
+) -> List[Dict]:
+    """
+    Memoize a test generator by (generator, url, business_context, provider, model).
+    
+    Results are kept in memory for the current run and persisted under
+    CACHE_DIR so later runs on the same URL skip the LLM call entirely.
+    The provider and model are part of the key, so switching LLM_PROVIDER or
+    LLM_MODEL generates fresh results instead of reusing another model's.
+    Empty results are never cached so failed generations are retried.
+    
+    Args:
+        fn: Async test generator, e.g. generate_functional_tests
+        url: URL passed to the generator
+        business_context: Business context passed to the generator
+    
+    Returns:
+        List of generated test dictionaries
+    """
+    if cache_disabled:
+        return await fn(url, business_context)
+    
+    result = cache_lookup(fn, url, business_context)
+    if result is not None:
+        return result
+    
+    key = _cache_key(fn, url, business_context)
+    cache_file = CACHE_DIR / f"{key}.json"
+    result = await fn(url, business_context)
+    
+    if isinstance(result, list) and result:
+        _memory_cache[key] = result
+        try:
+            CACHE_DIR.mkdir(exist_ok=True)
+            cache_file.write_bytes(
+                orjson.dumps(result) if orjson is not None
+                else json.dumps(result, ensure_ascii=False).encode('utf-8')
+            )
+        except OSError as e:
+            logger.warning("Failed to write cache file %s: %s", cache_file, e)
+    
+    return result
 
 
 def validate_test_structure(tests: Dict[str, List[Dict]]) -> bool:
@@ -31,38 +232,66 @@ def validate_test_structure(tests: Dict[str, List[Dict]]) -> bool:
     try:
         # Check top-level structure
         if not isinstance(tests, dict):
-            logging.error("Tests is not a dictionary")
+            logger.error("Tests is not a dictionary")
             return False
         
         if "functional_tests" not in tests or "nfr_tests" not in tests:
-            logging.error("Missing required keys: functional_tests or nfr_tests")
+            logger.error("Missing required keys: functional_tests or nfr_tests")
             return False
         
+        # Per-test checks only produce warnings; skip them when nobody is listening
+        if not logger.isEnabledFor(logging.WARNING):
+            return True
+        
         # Validate functional tests
-        for i, test in enumerate(tests.get("functional_tests", [])):
-            required_keys = ["id", "title", "steps", "expected_result"]
-            missing = [k for k in required_keys if k not in test]
+        for i, test in enumerate(tests["functional_tests"]):
+            if not isinstance(test, dict):
+                logger.warning("Functional test %d is not an object: %r", i, test)
+                continue
+            missing = REQUIRED_FUNCTIONAL_KEYS - test.keys()
             if missing:
-                logging.warning(f"Functional test {i} missing keys: {missing}")
+                logger.warning("Functional test %d missing keys: %s", i, sorted(missing))
         
         # Validate NFR tests
-        for i, test in enumerate(tests.get("nfr_tests", [])):
-            required_keys = ["id", "category", "title", "acceptance_criteria"]
-            missing = [k for k in required_keys if k not in test]
+        for i, test in enumerate(tests["nfr_tests"]):
+            if not isinstance(test, dict):
+                logger.warning("NFR test %d is not an object: %r", i, test)
+                continue
+            missing = REQUIRED_NFR_KEYS - test.keys()
             if missing:
-                logging.warning(f"NFR test {i} missing keys: {missing}")
+                logger.warning("NFR test %d missing keys: %s", i, sorted(missing))
         
         return True
         
     except Exception as e:
-        logging.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         return False
 
 
+def coerce_test_list(result, label: str) -> List[Dict]:
+    """
+    Turn a gathered generator result into a list of tests.
+    
+    Args:
+        result: Value or exception returned by asyncio.gather(return_exceptions=True)
+        label: Test category name used in the error log
+    
+    Returns:
+        result if it is a list, otherwise an empty list
+    """
+    if isinstance(result, list):
+        return result
+    if isinstance(result, Exception):
+        logger.error("%s test generation failed: %s", label, result)
+    return []
+
+
 async def generate_all_tests(url: str, business_context: str) -> Dict[str, List[Dict]]:
     """
     Asynchronously generates both functional and non-functional requirement (NFR) tests for a given URL.
     This function runs two test generation tasks concurrently: one for functional tests and another for NFR tests.
+    A page accessibility probe runs alongside them rather than blocking their start,
+    and is skipped when both suites are served from the cache.
     It handles potential exceptions during the test generation process and ensures that the returned results are 
     in the form of lists, even in the case of errors.
     Args:
@@ -77,59 +306,57 @@ async def generate_all_tests(url: str, business_context: str) -> Dict[str, List[
     - Errors encountered during the generation of functional or NFR tests.
     - The number of tests generated for both functional and NFR categories.
     """
-    logging.info(f"Starting test generation for URL: {url}")
+    logger.info("Starting test generation for URL: %s", url)
     
-    # Pre-validate that we can access the URL
-    try:
-        from cua_tools import get_interactive_elements
-        logging.info("Testing page accessibility...")
-        elements = await get_interactive_elements(url)
-        
-        if not elements or len(elements) == 0:
-            logging.warning(f"No interactive elements found on {url}")
-            logging.warning("This may indicate:")
-            logging.warning("  1. Page requires JavaScript (loaded but not executed)")
-            logging.warning("  2. Page has no forms/buttons/links")
-            logging.warning("  3. Page uses shadow DOM or iframes")
-            logging.info("Proceeding with test generation anyway...")
-        else:
-            logging.info(f"Found {len(elements)} interactive elements")
-            
-    except Exception as e:
-        logging.error(f"Failed to access page: {e}")
-        logging.error("Cannot generate tests without accessing the page.")
+    functional_tests = cache_lookup(generate_functional_tests, url, business_context)
+    nfr_tests = cache_lookup(generate_nfr_tests, url, business_context)
+    if functional_tests is not None and nfr_tests is not None:
+        # Both suites come from the cache, so the page never needs loading
+        logger.info("Using cached tests for %s; skipping page accessibility probe", url)
+        logger.info("Generated %d functional tests", len(functional_tests))
+        logger.info("Generated %d NFR tests", len(nfr_tests))
         return {
-            "functional_tests": [],
-            "nfr_tests": []
+            "functional_tests": functional_tests,
+            "nfr_tests": nfr_tests
         }
     
-    # Run both test generation tasks concurrently
-    func_tests_task = generate_functional_tests(url, business_context)
-    nfr_tests_task = generate_nfr_tests(url, business_context)
+    # Probe page accessibility concurrently with both test generation tasks
+    # so the page load overlaps with prompt building and LLM latency
+    logger.info("Testing page accessibility...")
+    probe_task = asyncio.create_task(get_cached_elements(url))
+    func_tests_task = asyncio.create_task(cached(generate_functional_tests, url, business_context))
+    nfr_tests_task = asyncio.create_task(cached(generate_nfr_tests, url, business_context))
     
-    functional_tests, nfr_tests = await asyncio.gather(
+    elements, functional_tests, nfr_tests = await asyncio.gather(
+        probe_task,
         func_tests_task,
         nfr_tests_task,
         return_exceptions=True
     )
     
-    # Handle potential errors
-    if isinstance(functional_tests, Exception):
-        logging.error(f"Functional test generation failed: {functional_tests}")
-        functional_tests = []
+    if isinstance(elements, Exception):
+        logger.error("Failed to access page: %s", elements)
+        logger.error("Cannot generate tests without accessing the page.")
+        return {
+            "functional_tests": [],
+            "nfr_tests": []
+        }
     
-    if isinstance(nfr_tests, Exception):
-        logging.error(f"NFR test generation failed: {nfr_tests}")
-        nfr_tests = []
+    if not elements:
+        logger.warning("No interactive elements found on %s", url)
+        logger.warning("This may indicate:")
+        logger.warning("  1. Page requires JavaScript (loaded but not executed)")
+        logger.warning("  2. Page has no forms/buttons/links")
+        logger.warning("  3. Page uses shadow DOM or iframes")
+    else:
+        logger.info("Found %d interactive elements", len(elements))
     
-    # Ensure we have lists
-    if not isinstance(functional_tests, list):
-        functional_tests = []
-    if not isinstance(nfr_tests, list):
-        nfr_tests = []
+    # Handle potential errors and ensure we have lists
+    functional_tests = coerce_test_list(functional_tests, "Functional")
+    nfr_tests = coerce_test_list(nfr_tests, "NFR")
     
-    logging.info(f"Generated {len(functional_tests)} functional tests")
-    logging.info(f"Generated {len(nfr_tests)} NFR tests")
+    logger.info("Generated %d functional tests", len(functional_tests))
+    logger.info("Generated %d NFR tests", len(nfr_tests))
     
     return {
         "functional_tests": functional_tests,
@@ -137,6 +364,71 @@ async def generate_all_tests(url: str, business_context: str) -> Dict[str, List[
     }
 
 
+async def generate_all_tests_batch(pairs: List[Tuple[str, str]]) -> List[Dict[str, List[Dict]]]:
+    """
+    Generate functional and NFR tests for several URLs in one invocation.
+    
+    All URLs are processed concurrently so their page loads and LLM round-trips
+    overlap instead of being paid one after another.
+    
+    Args:
+        pairs: List of (url, business_context) tuples
+    
+    Returns:
+        List of test suites (see generate_all_tests), in the same order as pairs
+    """
+    logger.info("Starting batch test generation for %d URL(s)", len(pairs))
+    return list(await asyncio.gather(
+        *(generate_all_tests(url, business_context) for url, business_context in pairs)
+    ))
+
+
+# Long-lived event loop shared by every run_async call in this process
+_runner = None
+
+
+def _close_runner() -> None:
+    """Shut down pooled browsers on the runner's loop, then close it."""
+    global _runner
+    if _runner is None:
+        return
+    try:
+        run_async(close_browser_pool())
+    except Exception as e:
+        logger.debug("Error closing browser pool: %s", e)
+    _runner.close()
+    _runner = None
+
+
+def run_async(coro):
+    """
+    Run a coroutine to completion on a long-lived event loop.
+    
+    Unlike asyncio.run, the loop is created once and reused across calls, so
+    repeated or batch invocations skip event-loop setup and teardown. Uses
+    asyncio.Runner on Python 3.11+ and a manually managed loop otherwise,
+    backed by uvloop when it is installed.
+    
+    Args:
+        coro: Coroutine to run
+    
+    Returns:
+        The coroutine's result
+    """
+    global _runner
+    if _runner is None:
+        loop_factory = uvloop.new_event_loop if uvloop is not None else None
+        if hasattr(asyncio, "Runner"):
+            _runner = asyncio.Runner(loop_factory=loop_factory)
+        else:
+            _runner = loop_factory() if loop_factory else asyncio.new_event_loop()
+        atexit.register(_close_runner)
+    
+    if isinstance(_runner, asyncio.AbstractEventLoop):
+        return _runner.run_until_complete(coro)
+    return _runner.run(coro)
+
+
 def normalize_url(url: str) -> str:
     """
     Normalize and fix common URL issues.
@@ -149,111 +441,222 @@ def normalize_url(url: str) -> str:
     """
     url = url.strip()
     
-    # Remove trailing slashes
-    url = url.rstrip('/')
-    
-    # Add protocol if missing
-    if not url.startswith(('http://', 'https://')):
-        url = f"https://{url}"
-    
-    # Force HTTPS for known sites that require it
-    known_https_sites = [
-        'google.com',
-        'facebook.com',
-        'twitter.com',
-        'github.com',
-        'linkedin.com',
-        'microsoft.com'
-    ]
-    
-    if url.startswith('http://'):
-        for site in known_https_sites:
-            if site in url:
-                url = url.replace('http://', 'https://', 1)
-                logging.info(f"Forcing HTTPS for {site}: {url}")
+    # Split off the scheme, adding https:// if it is missing
+    prefix = url[:8].lower()
+    if prefix.startswith('https://'):
+        scheme, rest = 'https', url[8:]
+    elif prefix.startswith('http://'):
+        scheme, rest = 'http', url[7:]
+    else:
+        scheme, rest = 'https', url
+    
+    # Split authority / path / query+fragment in one left-to-right sweep
+    match = _URL_AUTHORITY_END.search(rest)
+    authority_end = match.start() if match else len(rest)
+    match = _URL_PATH_END.search(rest, authority_end)
+    path_end = match.start() if match else len(rest)
+    authority = rest[:authority_end]
+    
+    # Remove trailing slashes from the path
+    path = rest[authority_end:path_end].rstrip('/')
+    
+    # Force HTTPS for known sites (and their subdomains) that require it
+    forced_site = None
+    if scheme == 'http':
+        labels = authority.rpartition('@')[2].partition(':')[0].lower().split('.')
+        for i in range(len(labels) - 1):
+            site = '.'.join(labels[i:])
+            if site in FORCE_HTTPS_SITES:
+                scheme = 'https'
+                forced_site = site
                 break
     
+    url = f"{scheme}://{authority}{path}{rest[path_end:]}"
+    if forced_site:
+        logger.info("Forcing HTTPS for %s: %s", forced_site, url)
     return url
 
 
+@dataclass(frozen=True)
+class Job:
+    """A normalized, validated URL paired with its business context."""
+    __slots__ = ("url", "business_context")
+    url: str
+    business_context: str
+
+
+def prepare_job(url: str, business_context: str = DEFAULT_BUSINESS_CONTEXT) -> Job:
+    """
+    Normalize and validate a user-provided URL once, outside the async path.
+    
+    Args:
+        url: User-provided URL
+        business_context: Business context for test generation
+    
+    Returns:
+        Job ready to be passed to run_job
+    
+    Raises:
+        ValueError: If the normalized URL is invalid
+    """
+    url = normalize_url(url)
+    validate_url(url)
+    return Job(url, business_context)
+
+
+async def run_job(job: Job) -> Dict[str, List[Dict]]:
+    """Generate functional and NFR tests for a prepared Job."""
+    return await generate_all_tests(job.url, job.business_context)
+
+
 def main():
     """
-    Main function to generate tests for a given URL.
-    This function prompts the user for a URL, validates the input, and generates 
-    functional and non-functional tests based on the provided URL. It also handles 
-    the addition of the 'https://' prefix if the URL does not start with 'http://' 
-    or 'https://'. The generated tests are validated for structure and saved to 
-    a JSON file. Logging is used to provide feedback on the process, including 
-    error handling for empty URLs and file writing issues.
+    Main function to generate tests for one or more URLs.
+    This function prompts the user for a URL (or reads a batch of URLs from the file
+    given via --urls-file, or from stdin when it is piped), validates the input, and generates functional and 
+    non-functional tests for each URL. It also handles the addition of the 'https://'
+    prefix if a URL does not start with 'http://' or 'https://'. The generated tests
+    are validated for structure and saved to a JSON file. Logging is used to provide
+    feedback on the process, including error handling for empty URLs and file writing issues.
     Steps:
-    1. Prompt the user for a URL and strip any leading/trailing whitespace.
-    2. Validate the URL to ensure it is not empty and starts with 'http://' or 'https://'.
-    3. Generate tests asynchronously using the provided URL and a predefined business context.
+    1. Read URLs from --urls-file, --url or piped stdin, or prompt the user for a single URL.
+    2. Normalize and validate each URL once into a Job, skipping invalid ones.
+    3. Generate tests asynchronously for all jobs using the --context business context.
     4. Validate the structure of the generated tests and log any warnings.
     5. Count the total number of generated tests and log appropriate messages.
-    6. Write the generated tests to a JSON file, handling any potential IO errors.
+    6. Write the generated tests to the --out JSON file, handling any potential IO errors.
+       A single URL produces one test suite; a batch produces suites keyed by URL.
     Returns:
         None
     """
-    url = input("Enter the URL to open: ").strip()
+    configure_logging()
+    
+    global cache_disabled
     
-    if not url:
-        logging.error("URL cannot be empty")
+    parser = argparse.ArgumentParser(description="Generate functional and NFR tests for web applications")
+    parser.add_argument("--url", help="URL to generate tests for (prompted for if omitted)")
+    parser.add_argument(
+        "--urls-file",
+        help="File with newline-separated URLs to generate tests for in a single batch"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        default=os.getenv("CUA_PRETTY", "").lower() in ("1", "true", "yes"),
+        help="Indent the output JSON (also enabled by CUA_PRETTY=1); compact by default"
+    )
+    parser.add_argument(
+        "--context",
+        default=DEFAULT_BUSINESS_CONTEXT,
+        help=f"Business context passed to the test generators (default: {DEFAULT_BUSINESS_CONTEXT!r})"
+    )
+    parser.add_argument(
+        "--out",
+        default=DEFAULT_OUTPUT_FILE,
+        help=f"Output JSON file (default: {DEFAULT_OUTPUT_FILE})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk test cache (same as CUA_NO_CACHE=1)"
+    )
+    args = parser.parse_args()
+    
+    if args.no_cache:
+        cache_disabled = True
+    
+    if args.urls_file:
+        try:
+            with open(args.urls_file, encoding='utf-8') as f:
+                raw_urls = [line.strip() for line in f]
+        except IOError as e:
+            logger.error("Failed to read URLs file: %s", e)
+            return
+    elif args.url:
+        raw_urls = [args.url.strip()]
+    elif not sys.stdin.isatty():
+        # URLs piped in (e.g. `cat urls.txt | python cua_agent.py`): read them all at once
+        raw_urls = [line.strip() for line in sys.stdin.read().splitlines()]
+    else:
+        raw_urls = [input("Enter the URL to open: ").strip()]
+    
+    raw_urls = [url for url in raw_urls if url]
+    if not raw_urls:
+        logger.error("URL cannot be empty")
         return
     
-    # Normalize URL
-    url = normalize_url(url)
-    logging.info(f"Using URL: {url}")
+    # Normalize and validate URLs once (dropping duplicates while keeping order)
+    jobs = []
+    for raw_url in raw_urls:
+        try:
+            jobs.append(prepare_job(raw_url, args.context))
+        except ValueError as e:
+            logger.error("Skipping invalid URL: %s", e)
+    jobs = list(dict.fromkeys(jobs))
+    if not jobs:
+        return
     
-    business_context = "Web application under test"
+    urls = [job.url for job in jobs]
+    for url in urls:
+        logger.info("Using URL: %s", url)
     
     # Generate tests
     try:
-        all_tests = asyncio.run(generate_all_tests(url, business_context))
+        results = run_async(generate_all_tests_batch([(job.url, job.business_context) for job in jobs]))
     except KeyboardInterrupt:
-        logging.info("Test generation cancelled by user")
+        logger.info("Test generation cancelled by user")
         return
     except Exception as e:
-        logging.error(f"Test generation failed with error: {e}")
-        logging.error("Common issues:")
-        logging.error("  1. URL is not accessible (firewall, VPN, etc.)")
-        logging.error("  2. Site requires authentication")
-        logging.error("  3. Site blocks automated browsers")
-        logging.error("  4. LLM API key is invalid or quota exceeded")
+        logger.error("Test generation failed with error: %s", e)
+        logger.error("Common issues:")
+        logger.error("  1. URL is not accessible (firewall, VPN, etc.)")
+        logger.error("  2. Site requires authentication")
+        logger.error("  3. Site blocks automated browsers")
+        logger.error("  4. LLM API key is invalid or quota exceeded")
         return
     
     # Validate structure
-    if not validate_test_structure(all_tests):
-        logging.warning("Generated tests have validation warnings (see above)")
+    for url, all_tests in zip(urls, results):
+        if not validate_test_structure(all_tests):
+            logger.warning("Generated tests for %s have validation warnings (see above)", url)
     
     # Check if we have any tests
-    total_tests = len(all_tests['functional_tests']) + len(all_tests['nfr_tests'])
+    total_tests = sum(
+        len(all_tests['functional_tests']) + len(all_tests['nfr_tests'])
+        for all_tests in results
+    )
     if total_tests == 0:
-        logging.error("No tests were generated. Check logs for errors.")
-        logging.info("Troubleshooting steps:")
-        logging.info("  1. Verify the URL is accessible in a browser")
-        logging.info("  2. Try using full HTTPS URL (e.g., https://www.google.com)")
-        logging.info("  3. Check your LLM provider API key and quota")
-        logging.info("  4. Enable debug logging: logging.basicConfig(level=logging.DEBUG)")
-        logging.info("Saving empty test file as placeholder")
+        logger.error("No tests were generated. Check logs for errors.")
+        logger.info("Troubleshooting steps:")
+        logger.info("  1. Verify the URL is accessible in a browser")
+        logger.info("  2. Try using full HTTPS URL (e.g., https://www.google.com)")
+        logger.info("  3. Check your LLM provider API key and quota")
+        logger.info("  4. Enable debug logging: logging.basicConfig(level=logging.DEBUG)")
+        logger.info("Saving empty test file as placeholder")
+    
+    if total_tests == 0 and len(urls) == 1:
+        # Nothing to encode: write the pre-rendered empty suite
+        payload = EMPTY_SUITE_JSON_PRETTY if args.pretty else EMPTY_SUITE_JSON
+    else:
+        output = results[0] if len(urls) == 1 else dict(zip(urls, results))
+        payload = serialize_tests(output, pretty=args.pretty)
     
     # Write to JSON file
-    output_file = "generated_tests.json"
+    output_file = args.out
     try:
-        with open(output_file, "w", encoding='utf-8') as f:
-            json.dump(all_tests, f, indent=2, ensure_ascii=False)
+        write_bytes(output_file, payload)
         
-        logging.info(f"Tests saved to: {output_file}")
-        logging.info(f"Total tests generated: {total_tests}")
+        logger.info("Tests saved to: %s", output_file)
+        logger.info("Total tests generated: %d", total_tests)
         
         if total_tests > 0:
-            logging.info("✅ Test generation completed successfully")
+            logger.info("✅ Test generation completed successfully")
         else:
-            logging.warning("⚠️  No tests generated - check AI model and prompts")
+            logger.warning("⚠️  No tests generated - check AI model and prompts")
             
-    except IOError as e:
-        logging.error(f"Failed to write output file: {e}")
+    except OSError as e:
+        logger.error("Failed to write output file: %s", e)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,19 +1,38 @@
+import atexit
 import base64
+import copy
 import os
 import requests
 import json
 import logging
 import asyncio
+import ast
 import re
+import tempfile
+import textwrap
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from types import CodeType, MappingProxyType
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Optional, Dict, List, Tuple, Union
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Browser, Page
-from llm_provider import LLMProvider, get_llm_provider
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from llm_provider import (
+    LLMProvider, get_llm_provider, post_with_retry, create_pooled_session,
+    encode_json, loads_json,
+    OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX,
+)
 
 # Load environment variables once at module level
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Initialize LLM provider (supports Ollama, OpenAI, Anthropic, Google, Azure)
 # Configure via environment variables:
 #   LLM_PROVIDER: 'ollama', 'openai', 'anthropic', 'google', 'azure'
@@ -25,42 +44,107 @@ load_dotenv()
 try:
     llm_provider = get_llm_provider()
 except Exception as e:
-    logging.warning(f"Failed to initialize LLM provider: {e}. Will attempt on first use.")
+    logger.warning("Failed to initialize LLM provider: %s. Will attempt on first use.", e)
     llm_provider = None
 
-# Configure logging once
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    force=True
-)
-
 # Constants
 VIEWPORT = {'width': 1280, 'height': 720}
-REQUEST_TIMEOUT = 300 # seconds
+REQUEST_TIMEOUT = 300  # seconds, per SDK request (the SDK default is 600)
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+BASE64_CHUNK_SIZE = 3 * 64 * 1024  # multiple of 3 so encoded chunks concatenate without padding
+# Total length of Base64 encodings kept in memory, keyed by (path, mtime, size);
+# bounded by size since a single MAX_FILE_SIZE file encodes to ~13MB
+BASE64_CACHE_BYTES = 32 * 1024 * 1024
+
+# Root that file paths must stay within, resolved once (the tool never chdirs)
+_CWD = Path.cwd().resolve()
+
+# Forbidden operations for code sanitization: names that may not be referenced
+# (as a variable, call or attribute) anywhere in generated code
+FORBIDDEN_NAMES = frozenset({
+    'eval', 'exec', 'compile', 'open', '__import__', '__builtins__',
+    'globals', 'locals', 'vars', 'getattr', 'setattr', 'delattr',
+    'os', 'sys', 'subprocess', 'importlib',
+    'create_subprocess_exec', 'create_subprocess_shell',
+    # Event loop access leads to loop.subprocess_shell/exec
+    'subprocess_shell', 'subprocess_exec',
+    'get_running_loop', 'get_event_loop', 'new_event_loop',
+    # str.format/format_map resolve "{0.__class__}"-style attribute paths at run time
+    'format', 'format_map',
+})
+
+# Concurrency caps for batch runs: simultaneous browser page loads and LLM requests
+BROWSER_CONCURRENCY = int(os.getenv("CUA_BROWSER_CONCURRENCY", "4"))
+LLM_CONCURRENCY = int(os.getenv("CUA_LLM_CONCURRENCY", "8"))
+
+# Chromium processes kept alive per headless mode and reused across calls
+BROWSER_POOL_SIZE = int(os.getenv("CUA_BROWSER_POOL_SIZE", "2"))
+
+# Pages opened in one reused element-extraction context before it is replaced,
+# so cookies, cache and memory held by a long-lived context stay bounded
+CONTEXT_MAX_PAGES = 50
+
+# Subresources skipped when only the DOM is needed (element extraction). Stylesheets
+# still load since they decide visibility and so innerText
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+
+# Desktop Chrome user agent for element extraction, so sites serve their normal layout
+EXTRACTION_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Interactive elements included in each test-generation prompt (and so extracted)
+PROMPT_ELEMENT_LIMIT = 20
+
+# Seconds an element extraction is reused before the page is loaded again
+ELEMENTS_CACHE_TTL = float(os.getenv("CUA_ELEMENTS_CACHE_TTL", "300"))
+
+# Worker threads for blocking LLM calls, sized to LLM_CONCURRENCY so the
+# default executor's (CPU-based) size doesn't become the real limit
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix="cua-llm")
+
+# Preload the configured models in the background on first use (opt-in)
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0") == "1"
+
+# Execution environment for generated automation code, copied per run.
+# Builtins are a read-only proxy so executed code can't alter them for later runs.
+# Only asyncio.sleep is exposed (immutably): the full module reaches the event
+# loop and through it subprocesses
+RESTRICTED_GLOBALS = MappingProxyType({
+    '__builtins__': MappingProxyType({
+        'print': print,
+        'len': len,
+        'str': str,
+        'int': int,
+        'float': float,
+        'bool': bool,
+        'list': list,
+        'dict': dict,
+        'True': True,
+        'False': False,
+        'None': None,
+    }),
+    'asyncio': namedtuple('asyncio', ['sleep'])(asyncio.sleep),
+})
+
+# Basic URL validation pattern, compiled once at import
+URL_PATTERN = re.compile(
+    r'^https?://'
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
+    r'localhost|'
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+    r'(?::\d+)?'
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE
+)
 
-# Forbidden operations for code sanitization
-FORBIDDEN_PATTERNS = [
-    r'\beval\b',
-    r'\b__import__\b',
-    r'\bopen\b',
-    r'\bos\.',
-    r'\bsys\.',
-    r'\bsubprocess\b',
-    r'\bimportlib\b',
-    r'\b__builtins__\b',
-    r'\bglobals\(',
-    r'\blocals\(',
-    r'\bsetattr\b',
-    r'\bdelattr\b',
-]
-REQUEST_TIMEOUT = 300 # seconds
+# Markdown code fence on the first or last line of generated code
+CODE_FENCE_PATTERN = re.compile(r'\A```[^\n]*(?:\n|\Z)|(?:\n|^)[ \t]*```[^\n]*\Z', re.MULTILINE)
 
 # Reusable requests session with connection pooling
 _session = None
 
+# Guards lazy creation of _session and _sdk_clients from executor threads
+_client_lock = threading.Lock()
+
 def get_session() -> requests.Session:
     """Get or create a persistent HTTP session for connection pooling.
     
@@ -79,21 +163,102 @@ def get_session() -> requests.Session:
         - ~30-50% faster than creating new session per request
         
     Thread Safety:
-        - Uses global variable (not thread-safe)
-        - Suitable for single-threaded async applications
-        - For multi-threaded use, implement thread-local storage
+        - Creation is guarded by a lock; the test generators call this from
+          executor threads
+        - requests.Session is safe to share for concurrent requests
         
     Configuration:
         - Sets Content-Type: application/json header
+        - Pool holds up to HTTP_POOL_MAXSIZE keep-alive connections per host
         - No timeout configured (uses request-level timeouts)
     """
     global _session
     if _session is None:
-        _session = requests.Session()
-        _session.headers.update({'Content-Type': 'application/json'})
+        with _client_lock:
+            if _session is None:
+                _session = create_pooled_session()
     return _session
 
 
+# Provider SDK clients, created on first use and shared by all generators
+_sdk_clients: Dict[str, object] = {}
+
+
+def get_sdk_client(provider: str):
+    """Get or create a persistent SDK client for a hosted LLM provider.
+    
+    Each SDK client owns an HTTP connection pool, so reusing one client lets
+    functional and NFR generation share keep-alive connections instead of
+    paying a fresh TLS handshake per call.
+    
+    Args:
+        provider (str): 'openai', 'anthropic', 'azure' or 'google'
+        
+    Returns:
+        The SDK client (for 'google', the configured google.generativeai module)
+        
+    Raises:
+        ValueError: If provider has no SDK client
+        ImportError: If the provider SDK is not installed
+    """
+    client = _sdk_clients.get(provider)
+    if client is not None:
+        return client
+    
+    with _client_lock:
+        client = _sdk_clients.get(provider)
+        if client is None:
+            client = _create_sdk_client(provider)
+            _sdk_clients[provider] = client
+    return client
+
+
+def _create_sdk_client(provider: str):
+    """Create a new SDK client for provider (see get_sdk_client)."""
+    if provider == "openai":
+        import openai
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=REQUEST_TIMEOUT)
+    elif provider == "anthropic":
+        import anthropic
+        client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), timeout=REQUEST_TIMEOUT)
+    elif provider == "azure":
+        import openai
+        client = openai.AzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_API_VERSION", "2024-02-15-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            timeout=REQUEST_TIMEOUT
+        )
+    elif provider == "google":
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        client = genai
+    else:
+        raise ValueError(f"No SDK client for provider: {provider}")
+    
+    return client
+
+
+def close_http_clients() -> None:
+    """Close the shared requests session and SDK clients (registered with atexit)."""
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+    
+    for client in _sdk_clients.values():
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.debug("Error closing SDK client: %s", e)
+    _sdk_clients.clear()
+
+
+atexit.register(close_http_clients)
+
+
 def validate_url(url: str) -> bool:
     """Validate URL to prevent SSRF and injection attacks.
     
@@ -140,22 +305,18 @@ def validate_url(url: str) -> bool:
     if not url or not isinstance(url, str):
         raise ValueError("URL must be a non-empty string")
     
-    # Basic URL validation
-    url_pattern = re.compile(
-        r'^https?://'
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
-        r'localhost|'
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
-        r'(?::\d+)?'
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE
-    )
-    
-    if not url_pattern.match(url):
+    if not _url_matches(url):
         raise ValueError(f"Invalid URL format: {url}")
     
     return True
 
 
+@lru_cache(maxsize=512)
+def _url_matches(url: str) -> bool:
+    """URL_PATTERN match, memoized: the same URL is validated at every pipeline stage."""
+    return URL_PATTERN.match(url) is not None
+
+
 def validate_file_path(file_path: str) -> Path:
     r"""Validate and sanitize file paths to prevent path traversal attacks.
     
@@ -199,11 +360,14 @@ def validate_file_path(file_path: str) -> Path:
     if not file_path or not isinstance(file_path, str):
         raise ValueError("File path must be a non-empty string")
     
-    path = Path(file_path).resolve()
+    path = Path(file_path)
+    if not path.is_absolute():
+        path = _CWD / path
+    path = path.resolve()
     
     # Check for path traversal attempts
     try:
-        path.relative_to(Path.cwd())
+        path.relative_to(_CWD)
     except ValueError:
         raise ValueError(f"File path must be within current directory: {file_path}")
     
@@ -231,30 +395,32 @@ def sanitize_code(code: str) -> str:
     Raises:
         ValueError: If code contains any forbidden operations
         
-    Forbidden Operations:
-        - eval: Arbitrary code execution
-        - __import__: Dynamic module imports
+    Forbidden Operations (FORBIDDEN_NAMES):
+        - import / from ... import: Any module import
+        - eval, exec, compile: Arbitrary code execution
+        - __import__, importlib: Dynamic imports
         - open: File system access
-        - os.*: Operating system operations
-        - sys.*: System-level operations
-        - subprocess: Shell command execution
-        - importlib: Dynamic imports
-        - __builtins__: Access to built-in functions
-        - globals(), locals(): Scope manipulation
-        - setattr, delattr: Object manipulation
+        - os.*, sys.*: Operating system / system-level operations
+        - subprocess, asyncio.create_subprocess_*, loop.subprocess_*: Shell command execution
+        - get_running_loop, get_event_loop, new_event_loop: Event loop access
+        - __builtins__, globals(), locals(), vars(): Scope access
+        - getattr, setattr, delattr: Object manipulation
+        - format, format_map: Attribute traversal inside format strings
+        - Any private or dunder attribute (_impl_obj, __class__, ...): Sandbox escapes
         
     Security Approach:
-        - Pattern-based detection using regex
-        - Case-insensitive matching
-        - Blocks entire code if any pattern matches
-        - Does not attempt to fix/remove patterns
+        - Parses the code with ast (top-level await allowed) and walks every node
+        - Checks names and attribute names, so text inside string literals and
+          comments (e.g. filling a field with "open source") is not flagged
+        - Blocks entire code if any forbidden name is used
+        - Code that does not parse is rejected
         
     Example:
         >>> sanitize_code("page.fill('#email', 'test@example.com')")
         "page.fill('#email', 'test@example.com')"
         
         >>> sanitize_code("import os; os.system('rm -rf /')")
-        ValueError: Generated code contains forbidden operation: \\bos\\.
+        ValueError: Generated code contains forbidden operation: import
         
     Use Cases:
         - Validating AI-generated Playwright automation code
@@ -262,16 +428,267 @@ def sanitize_code(code: str) -> str:
         - Preventing code injection attacks
         
     Limitations:
-        - Pattern-based (may have false positives/negatives)
-        - Cannot detect obfuscated attacks
+        - Name-based: a denylist cannot prove arbitrary code safe
         - Recommend sandboxed execution even after sanitization
     """
-    for pattern in FORBIDDEN_PATTERNS:
-        if re.search(pattern, code, re.IGNORECASE):
-            raise ValueError(f"Generated code contains forbidden operation: {pattern}")
+    try:
+        # Generated actions are bare `await page...` statements, so allow top-level await
+        tree = compile(code, "<generated>", "exec", ast.PyCF_ONLY_AST | ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+    except SyntaxError as e:
+        raise ValueError(f"Generated code is not valid Python: {e}")
+    
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            name = "import"
+        elif isinstance(node, ast.Name):
+            name = node.id
+        elif isinstance(node, ast.Attribute):
+            name = node.attr
+            if name.startswith("_"):
+                # Private and dunder attributes (Playwright's _impl_obj, __class__,
+                # __globals__, ...) lead out of the sandbox
+                raise ValueError(f"Generated code contains forbidden operation: {name}")
+        else:
+            continue
+        
+        if name == "import" or name in FORBIDDEN_NAMES:
+            raise ValueError(f"Generated code contains forbidden operation: {name}")
     return code
 
 
+# Long-lived Playwright driver and idle Chromium browsers, keyed by headless
+# mode. Launching Chromium costs ~1-2s; a new context on a pooled browser
+# costs tens of milliseconds. Like the semaphores, everything is bound to the
+# event loop it was created on, and is closed when that loop shuts down
+# (see _close_pool_on_loop_shutdown).
+_playwright_task: Optional[asyncio.Task] = None
+_playwright_loop: Optional[asyncio.AbstractEventLoop] = None
+_idle_browsers: Dict[bool, List[Browser]] = {}
+# Suspended _close_pool_on_loop_shutdown generator and the loop it guards
+_pool_shutdown_guard = None
+_pool_shutdown_guard_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _close_pool_on_loop_shutdown():
+    """
+    Close the browser pool when the event loop it runs on shuts down.
+    
+    Kept suspended at its yield for the life of the loop. asyncio.run() (and
+    any loop closed after loop.shutdown_asyncgens()) closes pending async
+    generators while the loop still runs, which runs the finally block there,
+    so callers that use asyncio.run() once per call don't leak a driver and
+    its browsers each time.
+    """
+    try:
+        yield
+    finally:
+        await close_browser_pool()
+
+
+async def _get_playwright():
+    """Start the shared Playwright driver on first use (once per event loop)."""
+    global _playwright_task, _playwright_loop, _pool_shutdown_guard, _pool_shutdown_guard_loop
+    loop = asyncio.get_running_loop()
+    if _playwright_task is None or _playwright_loop is not loop:
+        if _playwright_task is not None:
+            # Its loop was closed without shutting down async generators, so
+            # the pool could not be closed there
+            logger.warning("Browser pool from a previous event loop was not closed; "
+                           "await close_browser_pool() before closing the loop")
+        _schedule_warmup()
+        _idle_browsers.clear()
+        _origin_contexts.clear()
+        _origin_locks.clear()
+        _playwright_loop = loop
+        _playwright_task = loop.create_task(async_playwright().start())
+        if _pool_shutdown_guard_loop is not loop:
+            # One guard per loop, advanced once so the loop tracks it (this
+            # returns without suspending)
+            _pool_shutdown_guard_loop = loop
+            _pool_shutdown_guard = _close_pool_on_loop_shutdown()
+            await _pool_shutdown_guard.__anext__()
+    return await asyncio.shield(_playwright_task)
+
+
+async def _acquire_browser(headless: bool) -> Browser:
+    """Take an idle pooled browser, or launch one if none is idle."""
+    playwright = await _get_playwright()
+    idle = _idle_browsers.setdefault(headless, [])
+    while idle:
+        browser = idle.pop()
+        if browser.is_connected():
+            return browser
+    return await playwright.chromium.launch(headless=headless)
+
+
+def _release_browser(browser: Browser, headless: bool) -> None:
+    """Return a browser to the idle pool (disconnected browsers are dropped)."""
+    if browser.is_connected():
+        _idle_browsers.setdefault(headless, []).append(browser)
+
+
+@asynccontextmanager
+async def pooled_context(headless: bool = True, **context_options) -> AsyncIterator[BrowserContext]:
+    """
+    Open a fresh BrowserContext on a pooled Chromium browser.
+    
+    Contexts isolate cookies and storage, so each caller gets a clean session
+    without paying a browser launch. The context is closed and the browser
+    returned to the pool on exit.
+    
+    Args:
+        headless: Use the headless (default) or visible browser pool
+        **context_options: Passed to browser.new_context (viewport defaults to VIEWPORT)
+    
+    Yields:
+        BrowserContext on a pooled browser
+    """
+    context_options.setdefault("viewport", VIEWPORT)
+    # At most BROWSER_POOL_SIZE browsers per mode are checked out (and so exist) at once
+    async with get_semaphore(f"browser_pool:{headless}", BROWSER_POOL_SIZE):
+        browser = await _acquire_browser(headless)
+        try:
+            context = await browser.new_context(**context_options)
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            _release_browser(browser, headless)
+
+
+class _SharedContext:
+    """A pooled-browser context reused for pages of one origin (see extraction_page)."""
+    
+    __slots__ = ("context", "browser", "pages_opened", "active_pages")
+    
+    def __init__(self, context: BrowserContext, browser: Browser):
+        self.context = context
+        self.browser = browser
+        self.pages_opened = 0
+        self.active_pages = 0
+    
+    def usable(self) -> bool:
+        return self.pages_opened < CONTEXT_MAX_PAGES and self.browser.is_connected()
+
+
+# Element-extraction contexts keyed by origin. Bound to the Playwright loop
+# like the browser pool, and closed with it by close_browser_pool (which also
+# runs when that loop shuts down)
+_origin_contexts: Dict[str, _SharedContext] = {}
+_origin_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def _retire_context(entry: _SharedContext) -> None:
+    """Close a replaced shared context once no page is using it."""
+    if entry.active_pages == 0:
+        try:
+            await entry.context.close()
+        except Exception as e:
+            logger.debug("Error closing shared context: %s", e)
+
+
+async def _get_origin_context(origin: str) -> _SharedContext:
+    """Return the usable shared extraction context for origin, creating it if needed."""
+    await _get_playwright()  # resets the per-loop state below before it is used
+    entry = _origin_contexts.get(origin)
+    if entry is not None and entry.usable():
+        return entry
+    
+    # One creator per origin; concurrent callers wait and share its context
+    async with _origin_locks.setdefault(origin, asyncio.Lock()):
+        entry = _origin_contexts.get(origin)
+        if entry is not None and entry.usable():
+            return entry
+        if entry is not None:
+            del _origin_contexts[origin]
+            await _retire_context(entry)
+        
+        # Hold a pool slot only while creating the context; the browser then
+        # goes back to the pool and keeps hosting the context alongside other work
+        async with get_semaphore("browser_pool:True", BROWSER_POOL_SIZE):
+            browser = await _acquire_browser(True)
+            try:
+                context = await browser.new_context(viewport=VIEWPORT, user_agent=EXTRACTION_USER_AGENT)
+                # Only the DOM is read, so don't download images, media or fonts
+                await context.route("**/*", _block_heavy_resources)
+            finally:
+                _release_browser(browser, True)
+        
+        entry = _origin_contexts[origin] = _SharedContext(context, browser)
+        return entry
+
+
+@asynccontextmanager
+async def extraction_page(url: str) -> AsyncIterator[Page]:
+    """
+    Open a page for element extraction in a context shared by calls for url's origin.
+    
+    Repeated extractions from one site skip context setup (storage partition,
+    cookie jar, route handler) and reuse its HTTP cache; only the page is new.
+    Cookies and storage are therefore shared between those calls. A context is
+    replaced after CONTEXT_MAX_PAGES pages. At most BROWSER_CONCURRENCY pages
+    load at once, shared with capture_screenshots.
+    
+    Args:
+        url: Page URL; its scheme and host select the shared context
+    
+    Yields:
+        New Page, closed on exit
+    """
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    entry = await _get_origin_context(origin)
+    entry.pages_opened += 1
+    entry.active_pages += 1
+    try:
+        # Take the page cap only once the context exists: creating it takes a
+        # browser_pool slot, and capture_screenshots waits for "browser" while
+        # holding one, so the two semaphores are always taken pool first
+        async with get_semaphore("browser", BROWSER_CONCURRENCY):
+            page = await entry.context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+    finally:
+        entry.active_pages -= 1
+        # The last page of a context that has already been replaced closes it
+        if _origin_contexts.get(origin) is not entry:
+            await _retire_context(entry)
+
+
+async def close_browser_pool() -> None:
+    """Close pooled browsers and stop the Playwright driver.
+    
+    Runs automatically when an asyncio.run() loop that used the pool shuts
+    down; call it yourself before closing a loop you manage directly.
+    """
+    global _playwright_task
+    if _playwright_task is None or _playwright_loop is not asyncio.get_running_loop():
+        return
+    task, _playwright_task = _playwright_task, None
+    
+    for entry in _origin_contexts.values():
+        try:
+            await entry.context.close()
+        except Exception as e:
+            logger.debug("Error closing shared context: %s", e)
+    _origin_contexts.clear()
+    _origin_locks.clear()
+    
+    for browsers in _idle_browsers.values():
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug("Error closing pooled browser: %s", e)
+    _idle_browsers.clear()
+    
+    if task.done() and not task.cancelled() and task.exception() is None:
+        await task.result().stop()
+
+
 async def open_browser(url: str) -> None:
     """Launch browser and navigate to target URL for automation workflows.
     
@@ -285,10 +702,10 @@ async def open_browser(url: str) -> None:
         url (str): Target web page URL to navigate to (validated before launch)
         
     Returns:
-        None: Browser closes automatically after navigation completes
+        None: Page and context close automatically after navigation completes
         
     Configuration:
-        - Browser: Chromium
+        - Browser: Chromium (pooled, see pooled_context)
         - Headless: False (visible GUI for debugging)
         - Viewport: 1280x720 (laptop resolution)
         - Timeout: 30 seconds for navigation
@@ -296,26 +713,25 @@ async def open_browser(url: str) -> None:
         
     Process:
         1. Validates URL format and security
-        2. Launches Playwright async context
-        3. Creates Chromium browser instance
-        4. Opens new page with configured viewport
-        5. Navigates to URL
-        6. Logs page title for debugging
-        7. Auto-closes browser via context manager
+        2. Opens a fresh context on a pooled Chromium browser (launched on first use)
+        3. Opens new page with configured viewport
+        4. Navigates to URL
+        5. Logs page title for debugging
+        6. Closes the context and returns the browser to the pool
         
     Example Usage:
         ```python
         await open_browser("https://example.com")
-        # Browser opens, navigates, logs title, then closes
+        # Page opens, navigates, logs title, then closes
         ```
         
     Security:
         - URL validated before launch (prevents SSRF)
         - Auto-cleanup via async context manager
-        - No persistent browser state
+        - No persistent browser state (each call gets a new context)
         
     Performance:
-        - Initial launch: ~2 seconds
+        - Initial launch: ~2 seconds (first call only; later calls reuse the browser)
         - Page load: Varies by site (5-15 seconds typical)
         - Auto-cleanup prevents resource leaks
         
@@ -323,7 +739,7 @@ async def open_browser(url: str) -> None:
         - ValueError: Invalid URL format (from validate_url)
         - Timeout: Page load exceeds 30 seconds
         - Network errors: DNS failures, connection refused
-        - Browser auto-closes even on error (try/finally)
+        - Context closes even on error (try/finally)
         
     Use Cases:
         - Quick URL navigation for debugging
@@ -334,28 +750,33 @@ async def open_browser(url: str) -> None:
     """
     validate_url(url)
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        try:
-            page = await browser.new_page(viewport=VIEWPORT)
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            logging.debug(f"Title of the page: {await page.title()}")
-        finally:
-            await browser.close()
+    async with pooled_context(headless=False) as context:
+        page = await context.new_page()
+        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Title of the page: %s", await page.title())
 
 
-async def open_browser_capture_screen(url: str, screenshot_path: str) -> Tuple[Browser, Page]:
+async def open_browser_capture_screen(url: str, screenshot_path: str, *, full_page: bool = False,
+                                      quality: Optional[int] = None,
+                                      block_assets: bool = False) -> Tuple[Browser, Page]:
     """Open browser, navigate to URL, capture screenshot, and return browser handles.
     
     AI Tool Discovery Metadata:
     - Category: Browser Automation / Screenshot Capture
     - Task: Browser Launch with Screenshot
-    - Purpose: Launch browser, capture full-page screenshot, and return active browser handles for further automation
+    - Purpose: Launch browser, capture screenshot, and return active browser handles for further automation
     - Library: Playwright (async Chromium automation)
     
     Args:
         url (str): Target web page URL to navigate to (validated before launch)
         screenshot_path (str): File path to save screenshot (validated for security)
+        full_page (bool): Capture the whole scrollable page instead of the viewport
+            (slower and several times larger for long pages)
+        quality (Optional[int]): JPEG quality 0-100; requires a .jpg/.jpeg path
+        block_assets (bool): Skip BLOCKED_RESOURCE_TYPES (images, media, fonts) for
+            this page, as element extraction does; faster loads on media-heavy sites
+            when only the DOM matters, but the screenshot shows placeholders
         
     Returns:
         Tuple[Browser, Page]: Active browser and page objects for continued automation
@@ -363,20 +784,20 @@ async def open_browser_capture_screen(url: str, screenshot_path: str) -> Tuple[B
             - Page: Loaded page object with captured screenshot (must be closed by caller)
             
     Configuration:
-        - Browser: Chromium
+        - Browser: Chromium (taken from the visible-browser pool, see pooled_context)
         - Headless: False (visible GUI)
         - Viewport: 1280x720 (laptop resolution)
         - Timeout: 30 seconds for navigation
-        - Screenshot: Full page (scrolling viewport)
+        - Screenshot: Viewport only by default (full_page=True for the whole page)
         
     Process:
         1. Validates URL format and security
         2. Validates screenshot path (prevents path traversal)
-        3. Launches Playwright async context
-        4. Creates Chromium browser instance
+        3. Starts the shared Playwright driver if it isn't running yet
+        4. Takes an idle pooled Chromium browser, or launches one if none is idle
         5. Opens new page with configured viewport
         6. Navigates to URL (waits for DOMContentLoaded)
-        7. Captures full-page screenshot to specified path
+        7. Captures screenshot (viewport or full page, PNG or JPEG) to specified path
         8. Returns active browser and page (caller must close)
         
     Example Usage:
@@ -397,9 +818,9 @@ async def open_browser_capture_screen(url: str, screenshot_path: str) -> Tuple[B
         - Path must be within current directory
         
     Performance:
-        - Initial launch: ~2 seconds
+        - Initial launch: ~2 seconds (skipped when an idle pooled browser is available)
         - Page load: Varies by site (5-15 seconds typical)
-        - Screenshot: 1-3 seconds (depends on page height)
+        - Screenshot: well under 1 second for the viewport; 1-3 seconds full page
         - Total: ~8-20 seconds for typical page
         
     Error Handling:
@@ -407,10 +828,11 @@ async def open_browser_capture_screen(url: str, screenshot_path: str) -> Tuple[B
         - Timeout: Page load exceeds 30 seconds
         - IOError: Screenshot file write failure
         - Caller must handle browser.close() in try/finally
+        - On error the page is closed and the browser returned to the pool
         
     Resource Management:
-        - Browser and page must be closed by caller
-        - Async context manager exits after return
+        - Browser and page must be closed by caller (the browser leaves the pool)
+        - The shared Playwright driver stays running; close_browser_pool() stops it
         - Memory leak risk if browser not closed
         
     Use Cases:
@@ -424,15 +846,138 @@ async def open_browser_capture_screen(url: str, screenshot_path: str) -> Tuple[B
     validate_url(url)
     validated_path = validate_file_path(screenshot_path)
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
+    options = _screenshot_options(full_page, quality, validated_path)
+    # The browser is handed to the caller, so take it out of the pool for good
+    # instead of launching one (and a Playwright driver) per call
+    browser = await _acquire_browser(False)
+    try:
         page = await browser.new_page(viewport=VIEWPORT)
+        try:
+            if block_assets:
+                await page.route("**/*", _block_heavy_resources)
+            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            await page.screenshot(path=str(validated_path), **options)
+        except BaseException:
+            await page.context.close()
+            raise
+    except BaseException:
+        _release_browser(browser, False)
+        raise
+    return browser, page
+
+
+async def capture_screenshot(url: str, screenshot_path: Optional[str] = None, *, full_page: bool = False,
+                             quality: Optional[int] = None) -> bytes:
+    """Capture a screenshot and return the image bytes without a disk round-trip.
+    
+    AI Tool Discovery Metadata:
+    - Category: Browser Automation / Screenshot Capture
+    - Task: In-Memory Screenshot
+    - Library: Playwright (async Chromium automation)
+    
+    Args:
+        url (str): Target web page URL to navigate to (validated before launch)
+        screenshot_path (Optional[str]): If given, the image is also written here
+            (validated for security); the returned bytes are the same either way
+        full_page (bool): Capture the whole scrollable page instead of the viewport
+        quality (Optional[int]): If given, capture JPEG at this quality (0-100)
+            instead of PNG; much smaller payloads for vision models. A
+            screenshot_path must then be .jpg/.jpeg
+        
+    Returns:
+        bytes: Raw PNG (or JPEG) image data, ready for encode_bytes_to_base64()
+        
+    Resource Management:
+        - Uses a pooled browser; the context is closed before returning
+        
+    Tool Category: Browser Automation, Screenshot Capture
+    """
+    validate_url(url)
+    validated_path = validate_file_path(screenshot_path) if screenshot_path else None
+    
+    options = _screenshot_options(full_page, quality, validated_path)
+    async with pooled_context() as context:
+        image_bytes = await _screenshot_page(context, url, options)
+    
+    if validated_path is not None:
+        validated_path.write_bytes(image_bytes)
+    
+    return image_bytes
+
+
+async def capture_screenshot_b64(url: str, *, full_page: bool = False, quality: Optional[int] = None) -> str:
+    """Capture a screenshot straight to the Base64 string vision models take.
+    
+    Equivalent to encode_bytes_to_base64(await capture_screenshot(url, ...)):
+    the image never touches disk, unlike open_browser_capture_screen() followed
+    by encode_file_to_base64().
+    """
+    return encode_bytes_to_base64(await capture_screenshot(url, full_page=full_page, quality=quality))
+
+
+async def capture_screenshots(urls: List[str], *, full_page: bool = False,
+                              quality: Optional[int] = None) -> List[bytes]:
+    """Capture screenshots of several URLs on one pooled browser.
+    
+    AI Tool Discovery Metadata:
+    - Category: Browser Automation / Screenshot Capture
+    - Task: Batched In-Memory Screenshots
+    - Library: Playwright (async Chromium automation)
+    
+    Args:
+        urls (List[str]): Target web page URLs (each validated before launch)
+        full_page, quality: As for capture_screenshot()
+        
+    Returns:
+        List[bytes]: Raw PNG (or JPEG) data, in the same order as urls
+        
+    Performance:
+        - All pages share one context on a single pooled browser instead of
+          opening a context per URL as with capture_screenshot()
+        - Up to BROWSER_CONCURRENCY (CUA_BROWSER_CONCURRENCY) pages load at once
+        
+    Raises:
+        ValueError: If any URL is invalid
+    """
+    for url in urls:
+        validate_url(url)
+    
+    options = _screenshot_options(full_page, quality)
+    async with pooled_context() as context:
+        semaphore = get_semaphore("browser", BROWSER_CONCURRENCY)
+        
+        async def capture(url: str) -> bytes:
+            async with semaphore:
+                return await _screenshot_page(context, url, options)
+        
+        return list(await asyncio.gather(*(capture(url) for url in urls)))
+
+
+def _screenshot_options(full_page: bool, quality: Optional[int], path: Optional[Path] = None) -> Dict:
+    """Build page.screenshot() options; quality switches to JPEG (from path's suffix if given)."""
+    options: Dict = {'full_page': full_page}
+    if quality is not None:
+        if path is not None and path.suffix.lower() not in ('.jpg', '.jpeg'):
+            raise ValueError(f"Screenshot quality requires a .jpg/.jpeg path: {path}")
+        options['type'] = 'jpeg'
+        options['quality'] = quality
+    return options
+
+
+async def _screenshot_page(context: BrowserContext, url: str, options: Dict) -> bytes:
+    """Open url in a new page of context and return a screenshot taken with options."""
+    page = await context.new_page()
+    try:
         await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-        await page.screenshot(path=str(validated_path), full_page=True)
-        return browser, page
+        image_bytes = await page.screenshot(**options)
+    finally:
+        await page.close()
+    
+    logger.debug("Captured %s byte screenshot of %s", len(image_bytes), url)
+    return image_bytes
 
 
-def encode_file_to_base64(screenshot_path: str) -> str:
+def encode_file_to_base64(screenshot_path: Union[str, bytes]) -> str:
     """Encode file contents as Base64 string for AI vision model consumption.
     
     AI Tool Discovery Metadata:
@@ -442,7 +987,9 @@ def encode_file_to_base64(screenshot_path: str) -> str:
     - Use Case: Prepare screenshots for llama3.2-vision model input
     
     Args:
-        screenshot_path (str): Path to image file to encode (validated for security)
+        screenshot_path (Union[str, bytes]): Path to image file to encode (validated
+            for security). Raw image bytes or a "data:...;base64," URL are also
+            accepted and converted without touching the file system.
         
     Returns:
         str: Base64-encoded string representation of file contents
@@ -462,12 +1009,13 @@ def encode_file_to_base64(screenshot_path: str) -> str:
         ```
         
     Process:
-        1. Validates file path (prevents path traversal)
-        2. Checks file exists
-        3. Checks file size (max 10MB)
-        4. Reads file in binary mode
-        5. Encodes to Base64 string
-        6. Returns string (no data URI prefix)
+        1. Returns early for bytes (encoded directly) and data URLs (payload after the comma)
+        2. Validates file path (prevents path traversal)
+        3. Checks file exists
+        4. Checks file size (max 10MB)
+        5. Reads file in binary mode, BASE64_CHUNK_SIZE bytes at a time
+        6. Encodes each chunk into one Base64 buffer
+        7. Returns string (no data URI prefix)
         
     Security:
         - Path validated before access (prevents path traversal)
@@ -477,8 +1025,8 @@ def encode_file_to_base64(screenshot_path: str) -> str:
         
     Performance:
         - Typical encoding time: <100ms for 1MB file
-        - Memory usage: ~1.33x file size (Base64 overhead)
-        - No streaming (entire file loaded to memory)
+        - Memory usage: ~1.33x file size (Base64 overhead) plus one BASE64_CHUNK_SIZE buffer
+        - Streamed in chunks (the raw file is never held in memory whole)
         
     Error Handling:
         - ValueError: Invalid file path format
@@ -503,19 +1051,171 @@ def encode_file_to_base64(screenshot_path: str) -> str:
         
     Tool Category: Image Encoding, Base64 Conversion, Vision AI Preprocessing
     """
+    encoded = _encode_without_file(screenshot_path)
+    if encoded is not None:
+        return encoded
+    
+    validated_path, cache_key = _validate_encodable_file(screenshot_path)
+    
+    encoded = _get_cached_base64(cache_key)
+    if encoded is not None:
+        return encoded
+    
+    logger.debug("Encoding file %s to base64", screenshot_path)
+    # Read through one reusable chunk buffer instead of holding the whole file
+    # alongside its encoding; chunks are multiples of 3 bytes, so the encoded
+    # pieces concatenate without padding
+    encoded = bytearray()
+    chunk = bytearray(BASE64_CHUNK_SIZE)
+    view = memoryview(chunk)
+    with open(validated_path, "rb") as file:
+        while True:
+            size = file.readinto(chunk)
+            if not size:
+                break
+            encoded += base64.b64encode(view[:size])
+    
+    result = encoded.decode('ascii')
+    _cache_base64(cache_key, result)
+    return result
+
+
+def _encode_without_file(value: Union[str, bytes]) -> Optional[str]:
+    """Fast path for inputs that need no file read: raw bytes or a base64 data URL.
+    
+    Returns None when value should be treated as a file path (anything else,
+    including non-str values, which validate_file_path then rejects).
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return encode_bytes_to_base64(value)
+    if isinstance(value, str) and value.startswith("data:"):
+        header, sep, payload = value.partition(",")
+        if sep and header.endswith(";base64"):
+            return payload
+        raise ValueError("Only base64 data URLs are supported")
+    return None
+
+
+def _validate_encodable_file(screenshot_path: str) -> Tuple[Path, Tuple[str, int, int]]:
+    """Validate path, existence and size of a file before Base64 encoding.
+    
+    Returns the validated path and its (path, mtime_ns, size) cache key, so a
+    file rewritten in place (e.g. a new screenshot) gets a new key.
+    """
     validated_path = validate_file_path(screenshot_path)
     
-    if not validated_path.exists():
-        raise FileNotFoundError(f"File not found: {screenshot_path}")
+    # One stat() both checks existence and gives size/mtime for the cache key
+    try:
+        stat = validated_path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {screenshot_path}") from None
     
-    # Check file size
-    file_size = validated_path.stat().st_size
-    if file_size > MAX_FILE_SIZE:
-        raise ValueError(f"File too large: {file_size} bytes (max: {MAX_FILE_SIZE})")
+    if stat.st_size > MAX_FILE_SIZE:
+        raise ValueError(f"File too large: {stat.st_size} bytes (max: {MAX_FILE_SIZE})")
     
-    logging.debug(f"Encoding file {screenshot_path} to base64")
-    with open(validated_path, "rb") as file:
-        return base64.b64encode(file.read()).decode('utf-8')
+    return validated_path, (str(validated_path), stat.st_mtime_ns, stat.st_size)
+
+
+# Recently encoded files keyed by (path, mtime_ns, size), least recently used first.
+# Shared by the sync and async encoders, which may run in worker threads.
+_base64_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_base64_cache_bytes = 0  # total length of the cached encodings
+_base64_cache_lock = threading.Lock()
+
+
+def _get_cached_base64(key: Tuple[str, int, int]) -> Optional[str]:
+    """Return a cached encoding for key, marking it most recently used."""
+    with _base64_cache_lock:
+        encoded = _base64_cache.get(key)
+        if encoded is not None:
+            _base64_cache.move_to_end(key)
+        return encoded
+
+
+def _cache_base64(key: Tuple[str, int, int], encoded: str) -> None:
+    """Store an encoding, evicting the least recently used beyond BASE64_CACHE_BYTES."""
+    global _base64_cache_bytes
+    if len(encoded) > BASE64_CACHE_BYTES:
+        return
+    with _base64_cache_lock:
+        previous = _base64_cache.pop(key, None)
+        if previous is not None:
+            _base64_cache_bytes -= len(previous)
+        _base64_cache[key] = encoded
+        _base64_cache_bytes += len(encoded)
+        while _base64_cache_bytes > BASE64_CACHE_BYTES:
+            _, evicted = _base64_cache.popitem(last=False)
+            _base64_cache_bytes -= len(evicted)
+
+
+async def encode_file_to_base64_async(screenshot_path: Union[str, bytes]) -> str:
+    """Encode file contents as Base64 without blocking the event loop.
+    
+    AI Tool Discovery Metadata:
+    - Category: Image Processing / Encoding
+    - Task: Non-Blocking File to Base64 Conversion
+    - Purpose: Async counterpart of encode_file_to_base64 for concurrent pipelines
+    
+    Args:
+        screenshot_path (Union[str, bytes]): Path to image file to encode (validated
+            for security), raw image bytes, or a base64 data URL
+        
+    Returns:
+        str: Base64-encoded string representation of file contents (identical to
+            encode_file_to_base64 output)
+        
+    Process:
+        1. Validates file path, existence and size (same rules as encode_file_to_base64);
+           bytes and data URLs return early without file I/O
+        2. Returns the cached encoding if the file is unchanged since it was last encoded
+        3. Otherwise reads the file in BASE64_CHUNK_SIZE chunks in a worker thread,
+           yielding to the event loop between chunks
+        4. Encodes each chunk and appends it to a single output buffer
+        
+    Raises:
+        FileNotFoundError: If file does not exist at validated path
+        ValueError: If path is invalid or file size exceeds MAX_FILE_SIZE (10MB)
+    """
+    encoded = _encode_without_file(screenshot_path)
+    if encoded is not None:
+        return encoded
+    
+    validated_path, cache_key = _validate_encodable_file(screenshot_path)
+    
+    cached = _get_cached_base64(cache_key)
+    if cached is not None:
+        return cached
+    
+    logger.debug("Encoding file %s to base64 (async)", screenshot_path)
+    loop = asyncio.get_running_loop()
+    encoded = bytearray()
+    file = await loop.run_in_executor(None, open, validated_path, "rb")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, file.read, BASE64_CHUNK_SIZE)
+            if not chunk:
+                break
+            encoded += base64.b64encode(chunk)
+    finally:
+        file.close()
+    
+    result = encoded.decode('ascii')
+    _cache_base64(cache_key, result)
+    return result
+
+
+def encode_bytes_to_base64(data: bytes) -> str:
+    """Encode in-memory image bytes (e.g. from capture_screenshot) to a Base64 string.
+    
+    Same output as encode_file_to_base64() for the same content, but skips the
+    file system entirely, so no path validation or file size read is needed.
+    
+    Raises:
+        ValueError: If data exceeds MAX_FILE_SIZE (10MB)
+    """
+    if len(data) > MAX_FILE_SIZE:
+        raise ValueError(f"Image too large: {len(data)} bytes (max: {MAX_FILE_SIZE})")
+    return base64.b64encode(data).decode('ascii')
 
 
 def extract_elements_from_image(encoded_image: str) -> str:
@@ -568,7 +1268,7 @@ def extract_elements_from_image(encoded_image: str) -> str:
         - Model: llama3.2-vision
         - Stream: False (synchronous response)
         - Format: json (structured output)
-        - Timeout: 60 seconds (REQUEST_TIMEOUT)
+        - Timeout: OLLAMA_TIMEOUT (5s connect / 300s read), transient failures retried
         
     Performance:
         - Typical inference time: 10-30 seconds
@@ -606,7 +1306,7 @@ def extract_elements_from_image(encoded_image: str) -> str:
     if not encoded_image or not isinstance(encoded_image, str):
         raise ValueError("encoded_image must be a non-empty string")
     
-    logging.debug("Extracting elements from encoded image")
+    logger.debug("Extracting elements from encoded image")
     
     prompt = (
         "Extract all the HTML elements from the encoded image "
@@ -618,10 +1318,46 @@ def extract_elements_from_image(encoded_image: str) -> str:
         response = provider.generate_vision(prompt, encoded_image, format="json")
         return response
     except Exception as e:
-        logging.error(f"Vision API request failed: {e}")
+        logger.error("Vision API request failed: %s", e)
         raise ValueError(f"Failed to extract elements: {e}")
 
 
+async def extract_elements_from_image_async(encoded_image: str) -> str:
+    """Async counterpart of extract_elements_from_image that doesn't block the event loop.
+    
+    The vision request runs in the LLM worker pool, bounded by LLM_CONCURRENCY
+    together with all other LLM calls, so browser work on the loop continues.
+    """
+    return await _run_llm_call(extract_elements_from_image, encoded_image)
+
+
+async def extract_elements_from_images(encoded_images: List[str]) -> List[str]:
+    """Extract UI elements from several screenshots with concurrent vision requests.
+    
+    AI Tool Discovery Metadata:
+    - Category: Vision AI / UI Element Extraction
+    - Task: Batched Image-Based Element Detection
+    - Purpose: Overlap vision model round-trips for multiple screenshots
+    
+    Args:
+        encoded_images (List[str]): Base64-encoded images (from encode_file_to_base64)
+        
+    Returns:
+        List[str]: JSON strings of extracted elements, in the same order as encoded_images
+        
+    Concurrency:
+        - Each extract_elements_from_image call runs in a worker thread so the
+          event loop stays free while requests are in flight
+        - At most LLM_CONCURRENCY (CUA_LLM_CONCURRENCY) requests run at once
+        - With Ollama, start the server with OLLAMA_NUM_PARALLEL > 1 so
+          concurrent requests are decoded in parallel instead of queued
+        
+    Raises:
+        ValueError: If any extraction fails (see extract_elements_from_image)
+    """
+    return list(await asyncio.gather(*(extract_elements_from_image_async(image) for image in encoded_images)))
+
+
 def generate_automation_code(vision_elements: Dict, url: str) -> str:
     """Generate Python Playwright automation code using AI coding model.
     
@@ -666,11 +1402,11 @@ def generate_automation_code(vision_elements: Dict, url: str) -> str:
         - Endpoint: {OLLAMA_HOST}/api/generate
         - Model: deepseek-coder:6.7b (specialized for code generation)
         - Stream: False (synchronous response)
-        - Timeout: 60 seconds (REQUEST_TIMEOUT)
+        - Timeout: OLLAMA_TIMEOUT (5s connect / 300s read), transient failures retried
         
     Security:
         - URL validated before prompt construction
-        - Code sanitized with sanitize_code() (12 forbidden patterns)
+        - Code sanitized with sanitize_code() (AST check against FORBIDDEN_NAMES)
         - Prompt restricts allowed Playwright methods
         - Prompt explicitly forbids dangerous operations
         - Output saved to controlled filename (no path traversal)
@@ -711,10 +1447,17 @@ def generate_automation_code(vision_elements: Dict, url: str) -> str:
     """
     validate_url(url)
     
-    logging.debug("Generating automation code for vision elements")
+    logger.debug("Generating automation code for vision elements")
+    
+    # Vision output is already a JSON string; anything else is serialized
+    # compactly rather than embedded as a Python repr
+    if isinstance(vision_elements, str):
+        elements_json = vision_elements
+    else:
+        elements_json = encode_json(vision_elements).decode('utf-8')
     
     prompt = (
-        f"You are an automation agent. The user interface contains: {vision_elements}. "
+        f"You are an automation agent. The user interface contains: {elements_json}. "
         f"Generate Python Playwright code to fill out the search box in the url {url} "
         f"with the string 'AI based automation' and select the search button.\n"
         f"IMPORTANT: Only use these Playwright methods: page.fill(), page.click(), page.wait_for_selector()\n"
@@ -728,12 +1471,7 @@ def generate_automation_code(vision_elements: Dict, url: str) -> str:
         automation_code = provider.generate_code(prompt, max_tokens=2048, temperature=0.3)
         
         # Clean up code fences
-        lines = automation_code.strip().splitlines()
-        if lines and lines[0].strip().startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip().startswith("```"):
-            lines = lines[:-1]
-        automation_code = "\n".join(lines)
+        automation_code = CODE_FENCE_PATTERN.sub('', automation_code.strip())
         
         # Sanitize the generated code
         sanitized_code = sanitize_code(automation_code)
@@ -743,10 +1481,34 @@ def generate_automation_code(vision_elements: Dict, url: str) -> str:
         
         return sanitized_code
     except Exception as e:
-        logging.error(f"Code generation API request failed: {e}")
+        logger.error("Code generation API request failed: %s", e)
         raise ValueError(f"Failed to generate automation code: {e}")
 
 
+async def generate_automation_code_async(vision_elements: Dict, url: str) -> str:
+    """Async counterpart of generate_automation_code that doesn't block the event loop.
+    
+    The coding model request runs in the LLM worker pool, bounded by
+    LLM_CONCURRENCY together with all other LLM calls.
+    """
+    return await _run_llm_call(generate_automation_code, vision_elements, url)
+
+
+@lru_cache(maxsize=128)
+def _compile_automation_code(local_code: str) -> CodeType:
+    """Compile wrapped automation code once; reruns of the same script reuse the code object."""
+    return compile(local_code, "<automation>", "exec")
+
+
+def _write_debug_copy(code: str) -> str:
+    """Save code to a new temporary .py file for inspection and return its path."""
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".py", prefix="cua_automation_", delete=False, encoding="utf-8"
+    ) as code_file:
+        code_file.write(code)
+    return code_file.name
+
+
 async def execute_automation_code(actions_code: str, url: str) -> None:
     """Execute Playwright automation code against a specified URL with restricted scope.
     
@@ -765,14 +1527,14 @@ async def execute_automation_code(actions_code: str, url: str) -> None:
         
     Process:
         1. Validates URL format
-        2. Sanitizes code (checks for forbidden patterns)
+        2. Sanitizes code (checks for forbidden operations)
         3. Creates restricted execution environment
-        4. Wraps code in async function with browser setup
-        5. Executes code using exec() with restricted globals
-        6. Launches headless Chromium browser
+        4. Wraps code in an async run(page) function
+        5. Defines it using exec() with restricted globals
+        6. Opens a context and page on a pooled headless Chromium browser
         7. Navigates to URL
-        8. Executes automation actions
-        9. Closes browser automatically
+        8. Awaits run(page) to execute the automation actions
+        9. Closes the context and returns the browser to the pool
         
     Example Input Code:
         ```python
@@ -783,37 +1545,37 @@ async def execute_automation_code(actions_code: str, url: str) -> None:
         
     Security:
         - URL validated before execution
-        - Code sanitized (12 forbidden patterns checked)
+        - Code sanitized (AST check against FORBIDDEN_NAMES)
         - Restricted __builtins__ dictionary:
             - Allowed: print, len, str, int, float, bool, list, dict, True, False, None
             - Blocked: open, eval, exec, __import__, compile, etc.
-        - Only async_playwright and asyncio modules accessible
+        - Only asyncio.sleep (an immutable namespace, not the asyncio module) and
+          the page passed to run(page) are accessible
         - No file system access
         - No operating system commands
         - No dynamic imports
         
-    Restricted Execution Environment:
+    Restricted Execution Environment (RESTRICTED_GLOBALS, copied per run):
         ```python
         restricted_globals = {
-            '__builtins__': {
+            '__builtins__': {  # read-only MappingProxyType
                 'print': print,  # Logging only
                 'len': len, 'str': str, 'int': int, 'float': float, 'bool': bool,
                 'list': list, 'dict': dict,
                 'True': True, 'False': False, 'None': None
             },
-            'async_playwright': async_playwright,
-            'asyncio': asyncio
+            'asyncio': <asyncio.sleep only>
         }
         ```
         
     Browser Configuration:
-        - Browser: Chromium
+        - Browser: Chromium (pooled, see pooled_context)
         - Headless: True (no GUI)
         - Viewport: 1280x720 (laptop resolution)
         - Timeout: 30 seconds for navigation
         
     Performance:
-        - Browser launch: ~2 seconds
+        - Browser launch: ~2 seconds (first call only; later calls reuse the browser)
         - Page load: 5-15 seconds (depends on site)
         - Automation execution: Varies by code complexity
         - Total: 10-30 seconds typical
@@ -855,135 +1617,363 @@ async def execute_automation_code(actions_code: str, url: str) -> None:
     validate_url(url)
     sanitized_code = sanitize_code(actions_code)
     
-    logging.debug(f"Preparing to execute automation code on URL: {url}")
-    
-    # Create a restricted execution environment
-    restricted_globals = {
-        '__builtins__': {
-            'print': print,
-            'len': len,
-            'str': str,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'list': list,
-            'dict': dict,
-            'True': True,
-            'False': False,
-            'None': None,
-        },
-        'async_playwright': async_playwright,
-        'asyncio': asyncio,
-    }
+    logger.debug("Preparing to execute automation code on URL: %s", url)
     
-    local_code = f"""
-async def run():
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        try:
-            await page.goto("{url}", wait_until='domcontentloaded', timeout=30000)
-            {sanitized_code}
-        finally:
-            await browser.close()
-
-asyncio.run(run())
-"""
+    # Fresh globals per run (exec defines run() in them); builtins are shared read-only
+    restricted_globals = dict(RESTRICTED_GLOBALS)
+    
+    # The generated actions become the body of run(page); the page comes from
+    # a pooled browser, so the code itself never launches a browser
+    local_code = "async def run(page):\n" + textwrap.indent(sanitized_code.strip() or "pass", "    ") + "\n"
     
-    with open("local_code.py", "w", encoding='utf-8') as code_file:
-        code_file.write(local_code)
+    # Keep a copy only when debugging, in a per-run file so concurrent runs
+    # don't overwrite each other; the write stays off the event loop
+    if logger.isEnabledFor(logging.DEBUG):
+        loop = asyncio.get_running_loop()
+        debug_path = await loop.run_in_executor(None, _write_debug_copy, local_code)
+        logger.debug("Automation code saved to %s", debug_path)
     
-    logging.debug("Executing automation code in restricted environment")
+    logger.debug("Executing automation code in restricted environment")
     try:
-        exec(local_code, restricted_globals)
+        exec(_compile_automation_code(local_code), restricted_globals)
+        async with pooled_context() as context:
+            page = await context.new_page()
+            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            await restricted_globals['run'](page)
     except Exception as e:
-        logging.error(f"Error executing automation code: {e}")
+        logger.error("Error executing automation code: %s", e)
         raise ValueError(f"Automation execution failed: {e}")
 
 
-async def get_interactive_elements(url: str) -> List[Dict]:
+async def automate_url(url: str) -> str:
+    """Screenshot a page, extract its elements, generate automation code and run it.
+    
+    AI Tool Discovery Metadata:
+    - Category: Browser Automation / End-to-End Pipeline
+    - Task: Vision-Driven Automation
+    - Purpose: Chain capture, vision extraction, code generation and execution for one URL
+    
+    Args:
+        url (str): Target web page URL (validated before launch)
+        
+    Returns:
+        str: The sanitized automation code that was executed
+        
+    Concurrency:
+        - The coding model is preloaded while the vision request is in flight,
+          so with Ollama the code generation step doesn't wait for a model load
+        - Call with asyncio.gather for several URLs; browser and LLM work is
+          bounded by the shared semaphores
+        
+    Raises:
+        ValueError: If the URL is invalid or any stage fails
     """
-    Retrieve all interactive elements from a web page.
+    encoded_image = await capture_screenshot_b64(url)
+    
+    vision_elements, _ = await asyncio.gather(
+        extract_elements_from_image_async(encoded_image),
+        _run_llm_call(get_llm_provider().preload_coding_model),
+    )
+    
+    code = await generate_automation_code_async(vision_elements, url)
+    await execute_automation_code(code, url)
+    return code
+
+
+async def _block_heavy_resources(route) -> None:
+    """Route handler that aborts requests for BLOCKED_RESOURCE_TYPES."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def get_interactive_elements(url: str, limit: Optional[int] = PROMPT_ELEMENT_LIMIT) -> List[Dict]:
+    """
+    Retrieve interactive elements from a web page.
     
     Args:
         url: URL to analyze
+        limit: Maximum elements to return, in document order (None for all).
+            Defaults to the number the test prompts use, so the rest are
+            never serialized out of the page
     
     Returns:
         List of element dictionaries
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            viewport=VIEWPORT,
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-        
+    async with extraction_page(url) as page:
         try:
-            page = await context.new_page()
-            
             # Try multiple navigation strategies
             try:
                 # Strategy 1: Normal navigation with longer timeout
                 await page.goto(url, wait_until='domcontentloaded', timeout=30000)
                 
             except Exception as e1:
-                logging.warning(f"First navigation attempt failed: {e1}")
+                logger.warning("First navigation attempt failed: %s", e1)
                 
                 try:
                     # Strategy 2: Try with networkidle
                     await page.goto(url, wait_until='networkidle', timeout=30000)
                     
                 except Exception as e2:
-                    logging.warning(f"Second navigation attempt failed: {e2}")
+                    logger.warning("Second navigation attempt failed: %s", e2)
                     
                     # Strategy 3: Force HTTPS if using HTTP
                     if url.startswith('http://'):
                         https_url = url.replace('http://', 'https://', 1)
-                        logging.info(f"Retrying with HTTPS: {https_url}")
+                        logger.info("Retrying with HTTPS: %s", https_url)
                         try:
                             await page.goto(https_url, wait_until='domcontentloaded', timeout=30000)
                             url = https_url  # Update URL for future use
                         except Exception as e3:
-                            logging.error(f"All navigation attempts failed: {e3}")
+                            logger.error("All navigation attempts failed: %s", e3)
                             raise Exception(f"Could not load page: {url}. Try using full HTTPS URL.")
             
             # Wait for any dynamic content
             await page.wait_for_timeout(2000)
             
-            # Optimized JavaScript for element extraction
-            elements = await page.evaluate("""
-                () => {
+            # Optimized JavaScript for element extraction. Fields come back as
+            # parallel arrays (one per attribute) so key names aren't repeated
+            # for every element in the serialized result
+            result = await page.evaluate("""
+                (limit) => {
                     const selectors = 'a, button, input, textarea, select';
                     const nodeList = document.querySelectorAll(selectors);
-                    const elements = [];
+                    const count = limit === null ? nodeList.length : Math.min(nodeList.length, limit);
+                    const tag = [], type = [], id = [], name = [], text = [],
+                          placeholder = [], ariaLabel = [], role = [];
                     
-                    for (let i = 0; i < nodeList.length; i++) {
+                    for (let i = 0; i < count; i++) {
                         const el = nodeList[i];
-                        elements.push({
-                            tag: el.tagName.toLowerCase(),
-                            type: el.getAttribute('type'),
-                            id: el.id || null,
-                            name: el.getAttribute('name'),
-                            text: (el.innerText || '').trim().substring(0, 100),
-                            placeholder: el.getAttribute('placeholder'),
-                            ariaLabel: el.getAttribute('aria-label'),
-                            role: el.getAttribute('role')
-                        });
+                        tag.push(el.tagName.toLowerCase());
+                        type.push(el.getAttribute('type'));
+                        id.push(el.id || null);
+                        name.push(el.getAttribute('name'));
+                        text.push((el.innerText || '').trim().substring(0, 100));
+                        placeholder.push(el.getAttribute('placeholder'));
+                        ariaLabel.push(el.getAttribute('aria-label'));
+                        role.push(el.getAttribute('role'));
                     }
                     
-                    return elements;
+                    return {
+                        total: nodeList.length,
+                        columns: {tag, type, id, name, text, placeholder, ariaLabel, role}
+                    };
                 }
-            """)
+            """, limit)
+            columns = result['columns']
+            fields = list(columns)
+            # Leave out missing attributes (null or empty) rather than sending
+            # "type":null and the like to the model in every prompt
+            elements = [
+                {field: value for field, value in zip(fields, row) if value}
+                for row in zip(*columns.values())
+            ]
             
-            logging.info(f"Extracted {len(elements)} interactive elements from {url}")
+            logger.info("Extracted %s of %s interactive elements from %s", len(elements), result['total'], url)
             return elements
             
         except Exception as e:
-            logging.error(f"Element extraction failed: {e}")
+            logger.error("Element extraction failed: %s", e)
             raise
-        finally:
-            await browser.close()
+
+
+# Semaphores are bound to the event loop they are used on, so they are
+# created lazily and recreated if a new loop is started
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    """
+    Get the shared semaphore for a resource class on the running event loop.
+    
+    Args:
+        name: Resource class, e.g. 'browser' or 'llm'
+        limit: Maximum concurrent holders (used when the semaphore is created)
+    
+    Returns:
+        asyncio.Semaphore shared by all callers on this loop
+    """
+    global _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _semaphore_loop:
+        _semaphores.clear()
+        _semaphore_loop = loop
+    
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        semaphore = _semaphores[name] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+async def _run_llm_call(fn, *args):
+    """Run a blocking LLM call in the LLM thread pool, at most LLM_CONCURRENCY at once."""
+    loop = asyncio.get_running_loop()
+    async with get_semaphore("llm", LLM_CONCURRENCY):
+        return await loop.run_in_executor(_llm_executor, fn, *args)
+
+
+_warmup_started = False
+
+
+def _warmup() -> None:
+    """Load the configured models ahead of the first real request; failures are only logged."""
+    try:
+        get_llm_provider().preload()
+    except Exception as e:
+        logger.warning("LLM warmup failed: %s", e)
+
+
+def _schedule_warmup() -> None:
+    """Start _warmup once per process as a fire-and-forget job when LLM_WARMUP=1."""
+    global _warmup_started
+    if not LLM_WARMUP or _warmup_started:
+        return
+    _warmup_started = True
+    # Not awaited: model loading overlaps with browser startup and page loads
+    asyncio.get_running_loop().run_in_executor(_llm_executor, _warmup)
+
+
+# In-flight and completed element extractions keyed by URL, with the time each
+# was started, so the accessibility probe and both test generators share one
+# page load per run
+_elements_cache: Dict[str, Tuple["asyncio.Task[List[Dict]]", float]] = {}
+
+
+async def get_cached_elements(url: str) -> List[Dict]:
+    """
+    Retrieve interactive elements for a URL, reusing any earlier or in-flight extraction.
+    
+    Concurrent callers for the same URL await a single get_interactive_elements
+    call. Failed extractions are not cached so the next caller retries, and
+    results older than ELEMENTS_CACHE_TTL seconds are extracted again.
+    
+    Args:
+        url: URL to analyze
+    
+    Returns:
+        List of element dictionaries
+    """
+    _schedule_warmup()
+    now = time.monotonic()
+    task, started = _elements_cache.get(url, (None, 0.0))
+    if (task is None or task.get_loop() is not asyncio.get_running_loop()
+            or now - started > ELEMENTS_CACHE_TTL):
+        task = asyncio.ensure_future(get_interactive_elements(url))
+        _elements_cache[url] = (task, now)
+    
+    try:
+        # Shield so one cancelled caller does not cancel the shared extraction
+        return await asyncio.shield(task)
+    except Exception:
+        if _elements_cache.get(url, (None,))[0] is task:
+            del _elements_cache[url]
+        raise
+
+
+def clear_elements_cache(url: Optional[str] = None) -> None:
+    """
+    Invalidate cached element extractions.
+    
+    Args:
+        url: URL to invalidate, or None to clear the whole cache
+    """
+    if url is None:
+        _elements_cache.clear()
+    else:
+        _elements_cache.pop(url, None)
+
+
+# System prompt shared by every provider in generate_final_output. Kept
+# byte-identical across calls so it is always a cacheable prefix.
+JSON_SYSTEM_PROMPT = "You are a test generation expert. Respond ONLY with valid JSON. No markdown, no explanations."
+
+# Static instructions for the test generation prompts. The per-URL details are
+# appended after them, so every request shares the same leading text and the
+# model server can reuse its cached prefix instead of re-processing it.
+NFR_TESTS_PROMPT = """You are an expert QA architect specializing in comprehensive non-functional testing.
+
+Design EXHAUSTIVE NON-FUNCTIONAL test cases for the application described below, covering ALL dimensions:
+- PERFORMANCE: Load time, response time, throughput, resource utilization, caching, CDN effectiveness
+- RELIABILITY: Uptime, fault tolerance, recovery, error handling, data consistency, transaction integrity
+- SECURITY: Authentication, authorization, data encryption, injection attacks, CSRF, XSS, API security, SSL/TLS
+- USABILITY: Accessibility (WCAG 2.1 AA), responsive design, UI consistency, error messages, navigation clarity
+- COMPATIBILITY: Browser compatibility, device compatibility, OS compatibility, API backward compatibility
+- SCALABILITY: Concurrent users, database scaling, horizontal scaling, vertical scaling, rate limiting
+- MAINTAINABILITY: Code quality, documentation, logging, monitoring, deployment safety, rollback capability
+- COMPLIANCE: GDPR, HIPAA, CCPA, data retention, audit trails, regulatory requirements
+
+CRITICAL INSTRUCTIONS:
+1. Return ONLY valid JSON, nothing else
+2. All strings must be properly quoted and escaped
+3. Use double quotes for strings, not single quotes
+4. Ensure all arrays and objects are properly closed
+5. Do not include any explanatory text outside the JSON
+6. Generate at least 3-5 test cases per NFR category
+7. Include specific metrics and thresholds where applicable
+8. For security: list specific attack vectors to test
+9. For performance: include load profiles and expected baselines
+
+OUTPUT FORMAT (strict JSON only):
+{
+  "nfr": [
+    {
+      "id": "NFR_001",
+      "category": "performance|reliability|security|usability|compatibility|scalability|maintainability|compliance",
+      "title": "Specific test title",
+      "description": "Detailed test description",
+      "acceptance_criteria": ["criterion1", "criterion2", "criterion3"],
+      "tooling_suggestions": ["tool1", "tool2"],
+      "metrics": {"threshold": "value", "unit": "unit"},
+      "priority": "critical|high|medium|low"
+    }
+  ]
+}"""
+
+FUNCTIONAL_TESTS_PROMPT = """You are an expert QA engineer specializing in comprehensive functional testing.
+
+Design EXHAUSTIVE FUNCTIONAL test cases for the application described below, covering ALL scenarios:
+- HAPPY PATH: Primary user workflows, success scenarios, expected behaviors
+- NEGATIVE CASES: Invalid inputs, error handling, boundary violations, edge cases
+- BOUNDARY TESTING: Min/max values, empty fields, special characters, SQL injection attempts, XSS payloads
+- DATA VALIDATION: Required fields, format validation, length limits, type checking
+- USER INTERACTIONS: Form submission, navigation flows, button clicks, dropdown selections
+- ERROR RECOVERY: Retry mechanisms, error messages, fallback behaviors
+- STATE MANAGEMENT: Session persistence, data persistence, state transitions
+- CROSS-BROWSER: UI consistency, functionality across browsers (if applicable)
+- ACCESSIBILITY: Keyboard navigation, screen reader compatibility, ARIA labels
+- INTEGRATION: API calls, backend data sync, third-party service interactions
+
+CRITICAL INSTRUCTIONS:
+1. Return ONLY valid JSON, nothing else
+2. All strings must be properly quoted and escaped
+3. Use double quotes for strings, not single quotes
+4. Ensure all arrays and objects are properly closed
+5. Do not include any explanatory text outside the JSON
+6. Generate at least 5-8 test cases per functional area
+7. Include both positive and negative test scenarios
+8. Cover edge cases, boundary conditions, and error paths
+9. For form elements: test validation, submission, and error states
+10. For navigation: test all links, buttons, and user flows
+
+OUTPUT FORMAT (strict JSON only):
+{
+  "functional": [
+    {
+      "id": "FUNC_001",
+      "title": "Specific test case title",
+      "description": "Detailed test description and purpose",
+      "preconditions": ["precondition1", "precondition2", "precondition3"],
+      "steps": ["step1", "step2", "step3", "step4"],
+      "expected_result": "Detailed expected outcome and assertion points",
+      "test_data": {"input1": "value1", "input2": "value2"},
+      "category": "happy_path|negative|boundary|validation|navigation|error_recovery|state|accessibility",
+      "tags": ["tag1", "tag2", "tag3"],
+      "priority": "critical|high|medium|low"
+    }
+  ]
+}"""
 
 
 def build_nfr_tests_prompt(
@@ -1019,57 +2009,20 @@ def build_nfr_tests_prompt(
         dimensions, generating multiple test cases per category with specific metrics 
         and thresholds where applicable.
     """
-    elems_json = json.dumps(elements[:20], separators=(',', ':'))
-    expectations_json = json.dumps(nfr_expectations or {}, separators=(',', ':'))
+    elems_json = encode_json(elements[:PROMPT_ELEMENT_LIMIT]).decode('utf-8')
+    expectations_json = encode_json(nfr_expectations or {}).decode('utf-8')
     
-    return f"""You are an expert QA architect specializing in comprehensive non-functional testing.
+    return f"""{NFR_TESTS_PROMPT}
 
 Application under test:
 - URL: {url}
 - Business context: {business_context}
 
-Interactive elements (first 20): {elems_json}
+Interactive elements (first {PROMPT_ELEMENT_LIMIT}): {elems_json}
 
 Known NFR expectations: {expectations_json}
 
-Design EXHAUSTIVE NON-FUNCTIONAL test cases covering ALL dimensions:
-- PERFORMANCE: Load time, response time, throughput, resource utilization, caching, CDN effectiveness
-- RELIABILITY: Uptime, fault tolerance, recovery, error handling, data consistency, transaction integrity
-- SECURITY: Authentication, authorization, data encryption, injection attacks, CSRF, XSS, API security, SSL/TLS
-- USABILITY: Accessibility (WCAG 2.1 AA), responsive design, UI consistency, error messages, navigation clarity
-- COMPATIBILITY: Browser compatibility, device compatibility, OS compatibility, API backward compatibility
-- SCALABILITY: Concurrent users, database scaling, horizontal scaling, vertical scaling, rate limiting
-- MAINTAINABILITY: Code quality, documentation, logging, monitoring, deployment safety, rollback capability
-- COMPLIANCE: GDPR, HIPAA, CCPA, data retention, audit trails, regulatory requirements
-
-CRITICAL INSTRUCTIONS:
-1. Return ONLY valid JSON, nothing else
-2. All strings must be properly quoted and escaped
-3. Use double quotes for strings, not single quotes
-4. Ensure all arrays and objects are properly closed
-5. Do not include any explanatory text outside the JSON
-6. Generate at least 3-5 test cases per NFR category
-7. Include specific metrics and thresholds where applicable
-8. For security: list specific attack vectors to test
-9. For performance: include load profiles and expected baselines
-
-OUTPUT FORMAT (strict JSON only):
-{{
-  "nfr": [
-    {{
-      "id": "NFR_001",
-      "category": "performance|reliability|security|usability|compatibility|scalability|maintainability|compliance",
-      "title": "Specific test title",
-      "description": "Detailed test description",
-      "acceptance_criteria": ["criterion1", "criterion2", "criterion3"],
-      "tooling_suggestions": ["tool1", "tool2"],
-      "metrics": {{"threshold": "value", "unit": "unit"}},
-      "priority": "critical|high|medium|low"
-    }}
-  ]
-}}
-
-Remember: ONLY output the JSON object above. Generate comprehensive, exhaustive test coverage across all NFR dimensions. No markdown, no explanations."""
+Remember: ONLY output a JSON object in the OUTPUT FORMAT above. Generate comprehensive, exhaustive test coverage across all NFR dimensions. No markdown, no explanations."""
 
 
 def build_functional_tests_prompt(
@@ -1097,9 +2050,9 @@ def build_functional_tests_prompt(
     - Accessibility compliance
     The output format is strictly defined as a JSON object, ensuring that all test cases are structured and comprehensive.
     """
-    elems_json = json.dumps(elements[:20], separators=(',', ':'))
+    elems_json = encode_json(elements[:PROMPT_ELEMENT_LIMIT]).decode('utf-8')
     
-    return f"""You are an expert QA engineer specializing in comprehensive functional testing.
+    return f"""{FUNCTIONAL_TESTS_PROMPT}
 
 Application under test:
 - URL: {url}
@@ -1107,49 +2060,7 @@ Application under test:
 
 Interactive elements (all elements): {elems_json}
 
-Design EXHAUSTIVE FUNCTIONAL test cases covering ALL scenarios:
-- HAPPY PATH: Primary user workflows, success scenarios, expected behaviors
-- NEGATIVE CASES: Invalid inputs, error handling, boundary violations, edge cases
-- BOUNDARY TESTING: Min/max values, empty fields, special characters, SQL injection attempts, XSS payloads
-- DATA VALIDATION: Required fields, format validation, length limits, type checking
-- USER INTERACTIONS: Form submission, navigation flows, button clicks, dropdown selections
-- ERROR RECOVERY: Retry mechanisms, error messages, fallback behaviors
-- STATE MANAGEMENT: Session persistence, data persistence, state transitions
-- CROSS-BROWSER: UI consistency, functionality across browsers (if applicable)
-- ACCESSIBILITY: Keyboard navigation, screen reader compatibility, ARIA labels
-- INTEGRATION: API calls, backend data sync, third-party service interactions
-
-CRITICAL INSTRUCTIONS:
-1. Return ONLY valid JSON, nothing else
-2. All strings must be properly quoted and escaped
-3. Use double quotes for strings, not single quotes
-4. Ensure all arrays and objects are properly closed
-5. Do not include any explanatory text outside the JSON
-6. Generate at least 5-8 test cases per functional area
-7. Include both positive and negative test scenarios
-8. Cover edge cases, boundary conditions, and error paths
-9. For form elements: test validation, submission, and error states
-10. For navigation: test all links, buttons, and user flows
-
-OUTPUT FORMAT (strict JSON only):
-{{
-  "functional": [
-    {{
-      "id": "FUNC_001",
-      "title": "Specific test case title",
-      "description": "Detailed test description and purpose",
-      "preconditions": ["precondition1", "precondition2", "precondition3"],
-      "steps": ["step1", "step2", "step3", "step4"],
-      "expected_result": "Detailed expected outcome and assertion points",
-      "test_data": {{"input1": "value1", "input2": "value2"}},
-      "category": "happy_path|negative|boundary|validation|navigation|error_recovery|state|accessibility",
-      "tags": ["tag1", "tag2", "tag3"],
-      "priority": "critical|high|medium|low"
-    }}
-  ]
-}}
-
-Remember: ONLY output the JSON object above. Generate exhaustive, comprehensive functional test coverage. No markdown, no explanations."""
+Remember: ONLY output a JSON object in the OUTPUT FORMAT above. Generate exhaustive, comprehensive functional test coverage. No markdown, no explanations."""
 
 
 async def generate_functional_tests(url: str, business_context: str) -> List[Dict]:
@@ -1168,19 +2079,20 @@ async def generate_functional_tests(url: str, business_context: str) -> List[Dic
         Exception: Raises an exception if there is an issue with generating or parsing the tests.
     """
    
-    elements = await get_interactive_elements(url)
+    elements = await get_cached_elements(url)
     prompt = build_functional_tests_prompt(url, elements, business_context)
     
-    logging.debug("Generating functional tests with prompt")
-    raw = generate_final_output(prompt)
+    logger.debug("Generating functional tests with prompt")
+    # Blocking HTTP call; run it off the loop so other URLs' page loads proceed
+    raw = await _run_llm_call(generate_final_output, prompt)
     
-    logging.debug(f"Functional Raw Output (first 500 chars): {raw[:500]}...")
+    logger.debug("Functional Raw Output (first 500 chars): %s...", raw[:500])
     
     # Use robust JSON parser
     test_spec = parse_json_response(raw)
     
     if test_spec is None:
-        logging.error("Failed to parse functional tests JSON")
+        logger.error("Failed to parse functional tests JSON")
         return []
     
     return test_spec.get("functional", [])
@@ -1206,24 +2118,89 @@ async def generate_nfr_tests(
     Raises:
         Exception: Raises an exception if there is an error in generating or parsing the NFR tests.
     """
-    elements = await get_interactive_elements(url)
+    elements = await get_cached_elements(url)
     prompt = build_nfr_tests_prompt(url, elements, business_context, nfr_expectations)
     
-    logging.debug("Generating NFR tests with prompt")
-    raw = generate_final_output(prompt)
+    logger.debug("Generating NFR tests with prompt")
+    raw = await _run_llm_call(generate_final_output, prompt)
     
-    logging.debug(f"NFR Raw Output (first 500 chars): {raw[:500]}...")
+    logger.debug("NFR Raw Output (first 500 chars): %s...", raw[:500])
     
     # Use robust JSON parser
     test_spec = parse_json_response(raw)
     
     if test_spec is None:
-        logging.error("Failed to parse NFR tests JSON")
+        logger.error("Failed to parse NFR tests JSON")
         return
     
     return test_spec.get("nfr", [])
 
 
+# generate_final_output settings, read from the environment once at import
+# rather than per call (like the get_llm_provider() singleton the Ollama path uses)
+_final_provider = os.getenv("LLM_PROVIDER", "ollama").lower()
+_final_model: Optional[str] = os.getenv("LLM_MODEL")  # None: use the provider's default model
+_ollama_generate_url = f"{os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')}/api/generate"
+
+
+def _read_streamed_json(response: requests.Response) -> str:
+    """
+    Collect a streamed Ollama /api/generate response, stopping at the end of the JSON value.
+    
+    In JSON mode models often keep emitting whitespace after the top-level
+    object closes, until num_predict runs out. Closing the response as soon as
+    the object is complete drops the connection, which makes Ollama stop
+    generating.
+    
+    Args:
+        response: Streaming response (one JSON chunk per line); always closed
+    
+    Returns:
+        Generated text, cut after the top-level JSON value if one was completed
+    
+    Raises:
+        ValueError: If a stream line is not JSON
+    """
+    parts = []
+    depth = 0
+    in_string = escaped = False
+    try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = loads_json(line)
+            if "error" in chunk:
+                logger.error("Ollama stream error: %s", chunk["error"])
+                break
+            
+            text = chunk.get("response", "")
+            for i, char in enumerate(text):
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == '\\':
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in '{[':
+                    depth += 1
+                elif char in '}]' and depth:
+                    depth -= 1
+                    if depth == 0:
+                        parts.append(text[:i + 1])
+                        return "".join(parts)
+            parts.append(text)
+            
+            if chunk.get("done"):
+                break
+    finally:
+        response.close()
+    
+    return "".join(parts)
+
+
 def generate_final_output(prompt: str, retry_with_simpler: bool = True) -> str:
     """
     Generate response from LLM API with strict JSON enforcement.
@@ -1235,15 +2212,16 @@ def generate_final_output(prompt: str, retry_with_simpler: bool = True) -> str:
     Returns:
         Raw response string from model
     """
-    # Get LLM provider from environment
-    provider = os.getenv("LLM_PROVIDER", "ollama").lower()
+    provider = _final_provider
     
     # Enhanced payload with strict JSON controls
     if provider == "ollama":
         payload = {
-            "model": os.getenv("LLM_MODEL", "llama3.2"),
+            "model": get_llm_provider().model,  # LLM_MODEL, then legacy OLLAMA_MODEL
+            "system": JSON_SYSTEM_PROMPT,
             "prompt": prompt,
-            "stream": False,
+            "stream": True,  # read until the JSON closes, see _read_streamed_json
+            "keep_alive": OLLAMA_KEEP_ALIVE,
             "format": "json",
             "options": {
                 "temperature": 0.3,
@@ -1252,23 +2230,21 @@ def generate_final_output(prompt: str, retry_with_simpler: bool = True) -> str:
                 "stop": ["```", "}\n\n", "]\n\n"]
             }
         }
+        if OLLAMA_NUM_CTX:
+            payload["options"]["num_ctx"] = OLLAMA_NUM_CTX
         
         session = get_session()
+        ollama_url = _ollama_generate_url
         
         try:
-            response = session.post(
-                f"{os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')}/api/generate",
-                json=payload,
-                timeout=REQUEST_TIMEOUT
-            )
-            response.raise_for_status()
-            result = response.json().get("response", "")
+            response = post_with_retry(session, ollama_url, payload, stream=True)
+            result = _read_streamed_json(response)
             
             if not result.strip().startswith(('{', '[')):
-                logging.warning(f"Response doesn't start with JSON: {result[:100]}...")
+                logger.warning("Response doesn't start with JSON: %s...", result[:100])
                 
                 if retry_with_simpler:
-                    logging.info("Retrying with explicit JSON schema...")
+                    logger.info("Retrying with explicit JSON schema...")
                     enhanced_prompt = f"""{prompt}
 
 CRITICAL: Your response MUST be ONLY the JSON object. Do not include:
@@ -1282,35 +2258,24 @@ Start your response with {{ and end with }}"""
                     payload["prompt"] = enhanced_prompt
                     payload["options"]["temperature"] = 0.1
                     
-                    response = session.post(
-                        f"{os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')}/api/generate",
-                        json=payload,
-                        timeout=REQUEST_TIMEOUT
-                    )
-                    response.raise_for_status()
-                    result = response.json().get("response", "")
+                    response = post_with_retry(session, ollama_url, payload, stream=True)
+                    result = _read_streamed_json(response)
             
             return result
             
         except requests.exceptions.RequestException as e:
-            logging.error(f"Ollama API request failed: {e}")
+            logger.error("Ollama API request failed: %s", e)
+            return "{}"
+        except ValueError as e:
+            # A stream line that isn't JSON (proxy error page, truncated line)
+            logger.error("Invalid Ollama stream: %s", e)
             return "{}"
     
     elif provider == "openai":
         try:
-            import openai
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            model = os.getenv("LLM_MODEL", "gpt-4-turbo-preview")
+            client = get_sdk_client("openai")
             
-            # Determine token parameter
-            uses_new_param = any([
-                model.startswith("gpt-4o"),
-                model.startswith("gpt-4-turbo") and "2024" in model,
-                model.startswith("gpt-4.5"),
-                model.startswith("o1"),
-                model.startswith("o3")
-            ])
+            model = _final_model or "gpt-4-turbo-preview"
             
             # Build request parameters
             request_params = {
@@ -1318,7 +2283,7 @@ Start your response with {{ and end with }}"""
                 "messages": [
                     {
                         "role": "system",
-                        "content": "You are a test generation expert. Respond ONLY with valid JSON. No markdown, no explanations."
+                        "content": JSON_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -1326,15 +2291,10 @@ Start your response with {{ and end with }}"""
                     }
                 ],
                 "response_format": {"type": "json_object"},
-                "temperature": 0.3
+                "temperature": 0.3,
+                "max_completion_tokens": 8192
             }
             
-            # Add appropriate token limit parameter
-            if uses_new_param:
-                request_params["max_completion_tokens"] = 8192
-            else:
-                request_params["max_completion_tokens"] = 8192
-            
             response = client.chat.completions.create(**request_params)
             
             # Extract content
@@ -1342,55 +2302,39 @@ Start your response with {{ and end with }}"""
             
             # Check for empty response
             if not content or len(content.strip()) == 0:
-                logging.error(f"OpenAI returned empty response. Response object: {response}")
-                logging.error(f"Finish reason: {response.choices[0].finish_reason}")
+                logger.error("OpenAI returned empty response. Response object: %s", response)
+                logger.error("Finish reason: %s", response.choices[0].finish_reason)
                 
                 # Check finish reason
                 if response.choices[0].finish_reason == "length":
-                    logging.error("Response was truncated due to length limit. Increase max_completion_tokens.")
+                    logger.error("Response was truncated due to length limit. Increase max_completion_tokens.")
                     # Retry with longer limit
-                    if uses_new_param:
-                        request_params["max_completion_tokens"] = 16384
-                    else:
-                        request_params["max_completion_tokens"] = 16384
+                    request_params["max_completion_tokens"] = 16384
                     
-                    logging.info("Retrying with doubled token limit...")
+                    logger.info("Retrying with doubled token limit...")
                     response = client.chat.completions.create(**request_params)
                     content = response.choices[0].message.content
                 
                 elif response.choices[0].finish_reason == "content_filter":
-                    logging.error("Response was filtered by OpenAI content policy. Try different prompt.")
+                    logger.error("Response was filtered by OpenAI content policy. Try different prompt.")
                     return "{}"
                 
                 else:
-                    logging.error(f"Unknown issue. Finish reason: {response.choices[0].finish_reason}")
+                    logger.error("Unknown issue. Finish reason: %s", response.choices[0].finish_reason)
                     return "{}"
             
             return content if content else "{}"
         
         except Exception as e:
-            logging.error(f"OpenAI API request failed: {e}")
-            
-            # If it's the max_tokens error, retry with correct parameter
-            if "max_tokens" in str(e) and "max_completion_tokens" in str(e):
-                logging.info("Retrying with max_completion_tokens parameter...")
-                try:
-                    request_params["max_completion_tokens"] = request_params.pop("max_completion_tokens", 4096)
-                    response = client.chat.completions.create(**request_params)
-                    content = response.choices[0].message.content
-                    return content if content else "{}"
-                except Exception as retry_error:
-                    logging.error(f"Retry failed: {retry_error}")
+            logger.error("OpenAI API request failed: %s", e)
         
         return "{}"
     
     elif provider == "google":
         try:
-            import google.generativeai as genai
-            
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            genai = get_sdk_client("google")
             model = genai.GenerativeModel(
-                os.getenv("LLM_MODEL", "gemini-pro"),
+                _final_model or "gemini-pro",
                 generation_config={
                     "temperature": 0.3,
                     "max_output_tokens": 4096,
@@ -1405,20 +2349,18 @@ IMPORTANT: Respond with ONLY valid JSON. No markdown, no explanations."""
             return response.text
             
         except Exception as e:
-            logging.error(f"Google API request failed: {e}")
+            logger.error("Google API request failed: %s", e)
             return "{}"
     
     elif provider == "anthropic":
         try:
-            import anthropic
-            
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+            client = get_sdk_client("anthropic")
             
             response = client.messages.create(
-                model=os.getenv("LLM_MODEL", "claude-3-sonnet-20240229"),
+                model=_final_model or "claude-3-sonnet-20240229",
                 max_tokens=4096,  # Claude uses max_tokens (not max_completion_tokens)
                 temperature=0.3,
-                system="You are a test generation expert. Respond ONLY with valid JSON. No markdown, no explanations.",
+                system=JSON_SYSTEM_PROMPT,
                 messages=[
                     {
                         "role": "user",
@@ -1430,20 +2372,14 @@ IMPORTANT: Respond with ONLY valid JSON. No markdown, no explanations."""
             return response.content[0].text
             
         except Exception as e:
-            logging.error(f"Anthropic API request failed: {e}")
+            logger.error("Anthropic API request failed: %s", e)
             return "{}"
     
     elif provider == "azure":
         try:
-            import openai
-            
-            client = openai.AzureOpenAI(
-                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                api_version=os.getenv("AZURE_API_VERSION", "2024-02-15-preview"),
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-            )
+            client = get_sdk_client("azure")
             
-            model = os.getenv("LLM_MODEL", "gpt-4")
+            model = _final_model or "gpt-4"
             
             # Azure deployments may use either parameter depending on model version
             uses_new_param = any([
@@ -1457,7 +2393,7 @@ IMPORTANT: Respond with ONLY valid JSON. No markdown, no explanations."""
                 "messages": [
                     {
                         "role": "system",
-                        "content": "You are a test generation expert. Respond ONLY with valid JSON. No markdown, no explanations."
+                        "content": JSON_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
@@ -1478,16 +2414,25 @@ IMPORTANT: Respond with ONLY valid JSON. No markdown, no explanations."""
             return response.choices[0].message.content
             
         except Exception as e:
-            logging.error(f"Azure OpenAI API request failed: {e}")
+            logger.error("Azure OpenAI API request failed: %s", e)
             return "{}"
     
     else:
-        logging.error(f"Unknown LLM provider: {provider}")
+        logger.error("Unknown LLM provider: %s", provider)
         return "{}"
 
 
-import re
-from typing import Optional
+# Markdown fences around a JSON response, quotes not escaped by a backslash,
+# and the character opening a JSON object or array
+JSON_FENCE_START_PATTERN = re.compile(r'^```(?:json)?\s*', re.MULTILINE)
+JSON_FENCE_END_PATTERN = re.compile(r'\s*```$', re.MULTILINE)
+UNESCAPED_QUOTE_PATTERN = re.compile(r'(?<!\\)"')
+JSON_START_PATTERN = re.compile(r'[{\[]')
+# Contents of each complete string literal
+JSON_STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"', re.DOTALL)
+# String literals, backslash escapes and single structural characters, in order
+JSON_STRUCTURE_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\\.|[{}\[\]"]', re.DOTALL)
+
 
 def parse_json_response(raw: str, max_attempts: int = 3) -> Optional[dict]:
     """
@@ -1502,15 +2447,18 @@ def parse_json_response(raw: str, max_attempts: int = 3) -> Optional[dict]:
     """
     # Early validation: check if response is too short (incomplete)
     if len(raw.strip()) < 20:
-        logging.error(f"Response too short ({len(raw)} chars), likely incomplete: {raw}")
+        logger.error("Response too short (%s chars), likely incomplete: %s", len(raw), raw)
         return None
     
     # Check for incomplete JSON indicators
     if raw.strip().endswith(('",', '{', '[', '"id":')) and not raw.strip().endswith(('}', ']')):
-        logging.error(f"Response appears incomplete (ends with: {raw.strip()[-20:]})")
+        logger.error("Response appears incomplete (ends with: %s)", raw.strip()[-20:])
         return None
     
-    for attempt in range(max_attempts):
+    # A fenced response can't parse directly, so go straight to fence removal
+    first_attempt = min(1, max_attempts - 1) if raw.lstrip().startswith("```") else 0
+    
+    for attempt in range(first_attempt, max_attempts):
         try:
             # Attempt 1: Direct parsing
             if attempt == 0:
@@ -1518,51 +2466,42 @@ def parse_json_response(raw: str, max_attempts: int = 3) -> Optional[dict]:
             
             # Attempt 2: Remove markdown code fences
             elif attempt == 1:
-                cleaned = re.sub(r'^```(?:json)?\s*', '', raw, flags=re.MULTILINE)
-                cleaned = re.sub(r'\s*```$', '', cleaned, flags=re.MULTILINE)
+                cleaned = JSON_FENCE_START_PATTERN.sub('', raw)
+                cleaned = JSON_FENCE_END_PATTERN.sub('', cleaned)
                 cleaned = cleaned.strip()
             
             # Attempt 3: Extract JSON object/array
             elif attempt == 2:
-                # Find first { or [ and last } or ]
-                start = min(
-                    raw.find('{') if raw.find('{') != -1 else len(raw),
-                    raw.find('[') if raw.find('[') != -1 else len(raw)
-                )
+                # Find first { or [ (one scan that stops at the first hit) and
+                # last } or ] (reverse scans that stop at the trailing text)
+                opening = JSON_START_PATTERN.search(raw)
+                start = opening.start() if opening else -1
                 end = max(raw.rfind('}'), raw.rfind(']'))
                 
-                if start < end:
-                    cleaned = raw[start:end + 1]
-                    
-                    # Validate we have balanced braces/brackets
-                    if not is_balanced(cleaned):
-                        logging.warning(f"Extracted JSON has unbalanced braces/brackets")
-                        # Try to complete it
-                        cleaned = complete_json(cleaned)
-                else:
-                    cleaned = raw
+                # Unbalanced extracts are completed below, once this parse fails
+                cleaned = raw[start:end + 1] if -1 < start < end else raw
             
             # Try parsing
-            result = json.loads(cleaned)
-            logging.debug(f"Successfully parsed JSON on attempt {attempt + 1}")
+            result = loads_json(cleaned)
+            logger.debug("Successfully parsed JSON on attempt %s", attempt + 1)
             return result
             
         except json.JSONDecodeError as e:
-            logging.debug(f"Parse attempt {attempt + 1} failed: {e}")
+            logger.debug("Parse attempt %s failed: %s", attempt + 1, e)
             
             # On last attempt, try aggressive completion
             if attempt == max_attempts - 1:
                 try:
                     # Try to complete the JSON structure
                     completed = complete_json(cleaned)
-                    result = json.loads(completed)
-                    logging.warning("Recovered from incomplete JSON by completing structure")
+                    result = loads_json(completed)
+                    logger.warning("Recovered from incomplete JSON by completing structure")
                     return result
                 except:
                     # Log more details about the failure
-                    logging.error(f"All parse attempts failed.")
-                    logging.error(f"Last cleaned version ({len(cleaned)} chars): {cleaned[:200]}...")
-                    logging.error(f"JSON error at position {e.pos}: {e.msg}")
+                    logger.error("All parse attempts failed.")
+                    logger.error("Last cleaned version (%s chars): %s...", len(cleaned), cleaned[:200])
+                    logger.error("JSON error at position %s: %s", e.pos, e.msg)
                     return None
             
             continue
@@ -1574,6 +2513,9 @@ def is_balanced(json_str: str) -> bool:
     """
     Check if JSON string has balanced braces and brackets.
     
+    Only complete string literals, escapes and bracket characters are visited
+    (found by JSON_STRUCTURE_PATTERN in C), not every character of the text.
+    
     Args:
         json_str: JSON string to check
     
@@ -1581,35 +2523,14 @@ def is_balanced(json_str: str) -> bool:
         True if balanced, False otherwise
     """
     stack = []
-    pairs = {'{': '}', '[': ']', '"': '"'}
-    in_string = False
-    escape_next = False
-    
-    for char in json_str:
-        if escape_next:
-            escape_next = False
-            continue
-        
-        if char == '\\':
-            escape_next = True
-            continue
-        
-        if char == '"':
-            if not in_string:
-                in_string = True
-                stack.append(char)
-            elif stack and stack[-1] == '"':
-                stack.pop()
-                in_string = False
-        elif not in_string:
-            if char in '{[':
-                stack.append(char)
-            elif char in '}]':
-                if not stack:
-                    return False
-                opening = stack.pop()
-                if pairs.get(opening) != char:
-                    return False
+    for token in JSON_STRUCTURE_PATTERN.findall(json_str):
+        if token == '{' or token == '[':
+            stack.append('}' if token == '{' else ']')
+        elif token == '}' or token == ']':
+            if not stack or stack.pop() != token:
+                return False
+        elif token == '"':
+            return False  # string never terminated
     
     return len(stack) == 0
 
@@ -1624,14 +2545,14 @@ def complete_json(json_str: str) -> str:
     Returns:
         Completed JSON string
     """
-    logging.info("Attempting to complete incomplete JSON structure...")
+    logger.info("Attempting to complete incomplete JSON structure...")
     
     # Count unclosed structures
     open_braces = json_str.count('{') - json_str.count('}')
     open_brackets = json_str.count('[') - json_str.count(']')
     
     # Count unescaped quotes (should be even)
-    unescaped_quotes = len(re.findall(r'(?<!\\)"', json_str))
+    unescaped_quotes = sum(1 for _ in UNESCAPED_QUOTE_PATTERN.finditer(json_str))
     
     completed = json_str
     
@@ -1644,7 +2565,7 @@ def complete_json(json_str: str) -> str:
             after_quote = completed[last_quote_pos + 1:].strip()
             if not after_quote.startswith(('}', ']', ',')):
                 completed += '"'
-                logging.debug("Added closing quote")
+                logger.debug("Added closing quote")
     
     # Close any unterminated array/object value with comma
     if completed.rstrip().endswith(','):
@@ -1654,13 +2575,13 @@ def complete_json(json_str: str) -> str:
     # Close brackets and braces
     for _ in range(open_brackets):
         completed += '\n]'
-        logging.debug("Added closing bracket ]")
+        logger.debug("Added closing bracket ]")
     
     for _ in range(open_braces):
         completed += '\n}'
-        logging.debug("Added closing brace }")
+        logger.debug("Added closing brace }")
     
-    logging.info(f"Completed JSON: added {open_brackets} ']' and {open_braces} '}}'")
+    logger.info("Completed JSON: added %s ']' and %s '}'", open_brackets, open_braces)
     
     return completed
 
@@ -1676,60 +2597,84 @@ def detect_incomplete_response(raw: str, expected_keys: List[str]) -> bool:
     Returns:
         True if response appears incomplete
     """
-    indicators = [
-        len(raw.strip()) < 50,  # Too short
-        not raw.strip().endswith(('}', ']')),  # Doesn't end with closing
-        raw.strip().endswith(('",', '{')),  # Ends mid-structure
-        raw.count('{') != raw.count('}'),  # Unbalanced braces
-        raw.count('[') != raw.count(']'),  # Unbalanced brackets
-    ]
-    
-    # Check if expected keys are missing
-    for key in expected_keys:
-        if f'"{key}"' not in raw:
-            logging.warning(f"Expected key '{key}' not found in response")
-            indicators.append(True)
-    
-    if any(indicators):
-        logging.error("Response appears incomplete based on structural analysis")
+    stripped = raw.strip()
+    structurally_incomplete = (
+        len(stripped) < 50  # Too short
+        or not stripped.endswith(('}', ']'))  # Doesn't end with closing (or ends mid-structure)
+        or raw.count('{') != raw.count('}')  # Unbalanced braces
+        or raw.count('[') != raw.count(']')  # Unbalanced brackets
+    )
+    
+    if structurally_incomplete:
+        logger.error("Response appears incomplete based on structural analysis")
+        return True
+    
+    # Collect every quoted string once, then check keys by set membership
+    quoted = set(JSON_STRING_PATTERN.findall(raw))
+    missing_keys = [key for key in expected_keys if key not in quoted]
+    for key in missing_keys:
+        logger.warning("Expected key '%s' not found in response", key)
+    
+    if missing_keys:
+        logger.error("Response appears incomplete based on structural analysis")
         return True
     
     return False
 
 
-# Model-specific configurations for JSON generation
+# Model-specific configurations for JSON generation, keyed by (provider, model).
+# A (provider, None) entry is the provider's default for unlisted models.
+# get_model_config hands out deep copies, so callers can't change these
 MODEL_CONFIGS = {
-    "ollama": {
-        "llama3.2": {
-            "temperature": 0.3,
-            "top_p": 0.9,
-            "num_predict": 4096,
-            "stop": ["```", "}\n\n", "]\n\n"]
-        },
-        "mistral": {
-            "temperature": 0.2,
-            "top_p": 0.85,
-            "num_predict": 8192,
-            "stop": ["```"]
-        },
-        "deepseek-coder:6.7b": {
-            "temperature": 0.1,  # Very deterministic for code
-            "top_p": 0.95,
-            "num_predict": 8192
-        }
+    ("ollama", "llama3.2"): {
+        "temperature": 0.3,
+        "top_p": 0.9,
+        "num_predict": 4096,
+        "stop": ("```", "}\n\n", "]\n\n")
+    },
+    ("ollama", "mistral"): {
+        "temperature": 0.2,
+        "top_p": 0.85,
+        "num_predict": 8192,
+        "stop": ("```",)
     },
-    "openai": {
+    ("ollama", "deepseek-coder:6.7b"): {
+        "temperature": 0.1,  # Very deterministic for code
+        "top_p": 0.95,
+        "num_predict": 8192
+    },
+    ("openai", None): {
         "temperature": 0.3,
         "response_format": {"type": "json_object"}
     }
 }
 
+# Returned for providers without any configuration
+_EMPTY_CONFIG: Dict = {}
+
+
+def _resolve_model_configs() -> Dict[Tuple[str, Optional[str]], Dict]:
+    """Merge each provider default under its model-specific settings, once at import."""
+    resolved = {}
+    for (provider, model), config in MODEL_CONFIGS.items():
+        if model is None:
+            resolved[(provider, model)] = dict(config)
+        else:
+            resolved[(provider, model)] = {**MODEL_CONFIGS.get((provider, None), {}), **config}
+    return resolved
+
+
+# Complete per-model configurations served by get_model_config
+_RESOLVED_MODEL_CONFIGS = _resolve_model_configs()
+
+
 def get_model_config(provider: str, model: str) -> Dict:
-    """Get optimal configuration for specific model."""
-    if provider in MODEL_CONFIGS:
-        if isinstance(MODEL_CONFIGS[provider], dict):
-            if model in MODEL_CONFIGS[provider]:
-                return MODEL_CONFIGS[provider][model]
-            # Return default for provider
-            return MODEL_CONFIGS[provider].get("default", {})
-    return {}
+    """Get optimal configuration for specific model (the provider default if not listed).
+    
+    Returns a deep copy (nested values such as response_format included), so
+    callers may adjust it without affecting other callers.
+    """
+    config = _RESOLVED_MODEL_CONFIGS.get((provider, model))
+    if config is None:
+        config = _RESOLVED_MODEL_CONFIGS.get((provider, None), _EMPTY_CONFIG)
+    return copy.deepcopy(config)
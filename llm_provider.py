@@ -24,14 +24,139 @@ Usage:
 
 import os
 import logging
+import random
+import threading
+import time
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any, List
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    orjson = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# How long Ollama keeps a model loaded after a request (e.g. "10m", "-1" for forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+
+# Fixed context window for Ollama requests (0 = model default). Pinning it keeps
+# the KV cache layout stable so repeated prompt prefixes can be reused
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+
+# (connect, read) timeouts for Ollama requests. Connect fails fast when the
+# daemon is down; read allows for queued requests and slow generation
+OLLAMA_TIMEOUT = (
+    float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("OLLAMA_READ_TIMEOUT", "300")),
+)
+
+# (connect, read) timeouts for hosted provider requests. A bare 120 also allowed
+# 120s to connect, so an unreachable endpoint stalled a worker thread that long
+PROVIDER_TIMEOUT = (float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5")), 120.0)
+
+# Retries for transient Ollama failures (connection errors, timeouts, 429/5xx)
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+RETRY_BACKOFF_BASE = 1.0  # seconds
+RETRY_BACKOFF_MAX = 10.0  # seconds
+
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Keep-alive connections kept per host. The requests default (10) is below
+# the batch LLM concurrency, so extra connections were opened and dropped
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize compact JSON, with orjson when installed (payloads carry MBs of base64)."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode("utf-8")
+
+
+def decode_json(response: requests.Response) -> Any:
+    """Parse a JSON response body, with orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass  # let requests raise its usual (RequestException) decode error
+    return response.json()
+
+
+def loads_json(text: str) -> Any:
+    """Parse JSON text, with orjson when installed.
+    
+    Raises:
+        json.JSONDecodeError: If text is not valid JSON (orjson's error subclasses it)
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def create_pooled_session() -> requests.Session:
+    """Create a JSON session whose connection pool fits concurrent LLM calls.
+    
+    Retries are left to post_with_retry, so the adapter doesn't retry as well.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+# Ollama sessions keyed by base URL, so the text, vision and coding providers
+# share one keep-alive connection pool to the same daemon
+_ollama_sessions: Dict[str, requests.Session] = {}
+_ollama_sessions_lock = threading.Lock()
+
+
+def post_with_retry(session: requests.Session, url: str, payload: Dict[str, Any],
+                    timeout=OLLAMA_TIMEOUT, max_retries: int = OLLAMA_MAX_RETRIES,
+                    stream: bool = False) -> requests.Response:
+    """POST payload as JSON, retrying transient failures with jittered exponential backoff.
+    
+    The payload is resent unchanged, so a server-side prompt prefix cache still
+    applies on retry. Non-retryable HTTP errors raise immediately, after closing the
+    response. With stream=True the body of a successful response is left unread
+    for the caller, who must close it.
+    
+    Raises:
+        requests.exceptions.RequestException: After the last attempt fails
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, data=encode_json(payload), timeout=timeout, stream=stream)
+            if response.status_code not in _RETRYABLE_STATUS or attempt == max_retries:
+                try:
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError:
+                    # The caller never gets this response, so release its connection
+                    response.close()
+                    raise
+                return response
+            error = f"HTTP {response.status_code}"
+            response.close()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            error = e
+        
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        delay = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+        logger.warning("Request to %s failed (%s); retry %d/%d in %.1fs",
+                       url, error, attempt + 1, max_retries, delay)
+        time.sleep(delay)
+
 
 class BaseLLMProvider(ABC):
     """Abstract base class for LLM providers"""
@@ -44,9 +169,7 @@ class BaseLLMProvider(ABC):
     
     def _create_session(self) -> requests.Session:
         """Create HTTP session with connection pooling"""
-        session = requests.Session()
-        session.headers.update({'Content-Type': 'application/json'})
-        return session
+        return create_pooled_session()
     
     @abstractmethod
     def generate(self, prompt: str, format: str = "json", max_tokens: int = 4096, temperature: float = 0.7) -> str:
@@ -58,10 +181,14 @@ class BaseLLMProvider(ABC):
         """Generate response from prompt with image (vision models)"""
         pass
     
+    def preload(self) -> None:
+        """Load the model ahead of the first request (no-op for hosted providers)"""
+        pass
+    
     def _truncate_prompt(self, prompt: str, max_length: int = 50000) -> str:
         """Truncate prompt to prevent DoS"""
         if len(prompt) > max_length:
-            logging.warning(f"Prompt truncated from {len(prompt)} to {max_length} characters")
+            logger.warning("Prompt truncated from %s to %s characters", len(prompt), max_length)
             return prompt[:max_length]
         return prompt
 
@@ -77,6 +204,17 @@ class OllamaProvider(BaseLLMProvider):
         if not self.base_url.startswith(("http://", "https://")):
             raise ValueError("OLLAMA_BASE_URL must start with http:// or https://")
     
+    def _create_session(self) -> requests.Session:
+        """Reuse the pooled session for this Ollama base URL"""
+        session = _ollama_sessions.get(self.base_url)
+        if session is None:
+            with _ollama_sessions_lock:
+                session = _ollama_sessions.get(self.base_url)
+                if session is None:
+                    session = super()._create_session()
+                    _ollama_sessions[self.base_url] = session
+        return session
+    
     def generate(self, prompt: str, format: str = "json", max_tokens: int = 4096, temperature: float = 0.7) -> str:
         """Generate text using Ollama API"""
         prompt = self._truncate_prompt(prompt)
@@ -85,23 +223,21 @@ class OllamaProvider(BaseLLMProvider):
             "model": self.model,
             "prompt": prompt,
             "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
             "format": format if format == "json" else None,
             "options": {
                 "temperature": temperature,
                 "num_predict": max_tokens
             }
         }
+        if OLLAMA_NUM_CTX:
+            payload["options"]["num_ctx"] = OLLAMA_NUM_CTX
         
         try:
-            response = self.session.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                # timeout=500  # 5 minutes for large models
-            )
-            response.raise_for_status()
-            return response.json().get("response", "")
+            response = post_with_retry(self.session, f"{self.base_url}/api/generate", payload)
+            return decode_json(response).get("response", "")
         except requests.exceptions.RequestException as e:
-            logging.error(f"Ollama API request failed: {e}")
+            logger.error("Ollama API request failed: %s", e)
             raise ValueError(f"Failed to generate output: {e}")
     
     def generate_vision(self, prompt: str, image_base64: str, format: str = "json") -> str:
@@ -113,20 +249,30 @@ class OllamaProvider(BaseLLMProvider):
             "prompt": prompt,
             "stream": False,
             "images": [image_base64],
+            "keep_alive": OLLAMA_KEEP_ALIVE,
             "format": format if format == "json" else None,
         }
         
+        try:
+            response = post_with_retry(self.session, f"{self.base_url}/api/generate", payload)
+            return decode_json(response).get("response", "")
+        except requests.exceptions.RequestException as e:
+            logger.error("Ollama vision API request failed: %s", e)
+            raise ValueError(f"Failed to extract elements: {e}")
+
+
+    def preload(self) -> None:
+        """Load the model into memory without generating (empty prompt), honouring keep_alive"""
         try:
             response = self.session.post(
                 f"{self.base_url}/api/generate",
-                json=payload,
-                # timeout=500
+                data=encode_json({"model": self.model, "keep_alive": OLLAMA_KEEP_ALIVE}),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json().get("response", "")
+            logger.info("Preloaded Ollama model: %s", self.model)
         except requests.exceptions.RequestException as e:
-            logging.error(f"Ollama vision API request failed: {e}")
-            raise ValueError(f"Failed to extract elements: {e}")
+            logger.warning("Failed to preload Ollama model %s: %s", self.model, e)
 
 
 class OpenAIProvider(BaseLLMProvider):
@@ -166,13 +312,13 @@ class OpenAIProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/chat/completions",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            return decode_json(response)["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"OpenAI API request failed: {e}")
+            logger.error("OpenAI API request failed: %s", e)
             raise ValueError(f"Failed to generate output: {e}")
     
     def generate_vision(self, prompt: str, image_base64: str, format: str = "json") -> str:
@@ -201,13 +347,13 @@ class OpenAIProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/chat/completions",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            return decode_json(response)["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"OpenAI vision API request failed: {e}")
+            logger.error("OpenAI vision API request failed: %s", e)
             raise ValueError(f"Failed to extract elements: {e}")
 
 
@@ -250,13 +396,13 @@ class AnthropicProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/messages",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["content"][0]["text"]
+            return decode_json(response)["content"][0]["text"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Anthropic API request failed: {e}")
+            logger.error("Anthropic API request failed: %s", e)
             raise ValueError(f"Failed to generate output: {e}")
     
     def generate_vision(self, prompt: str, image_base64: str, format: str = "json") -> str:
@@ -292,13 +438,13 @@ class AnthropicProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/messages",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["content"][0]["text"]
+            return decode_json(response)["content"][0]["text"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Anthropic vision API request failed: {e}")
+            logger.error("Anthropic vision API request failed: %s", e)
             raise ValueError(f"Failed to extract elements: {e}")
 
 
@@ -335,13 +481,13 @@ class GoogleProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            return decode_json(response)["candidates"][0]["content"]["parts"][0]["text"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Google API request failed: {e}")
+            logger.error("Google API request failed: %s", e)
             raise ValueError(f"Failed to generate output: {e}")
     
     def generate_vision(self, prompt: str, image_base64: str, format: str = "json") -> str:
@@ -370,13 +516,13 @@ class GoogleProvider(BaseLLMProvider):
         try:
             response = self.session.post(
                 f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}",
-                json=payload,
-                timeout=120
+                data=encode_json(payload),
+                timeout=PROVIDER_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            return decode_json(response)["candidates"][0]["content"]["parts"][0]["text"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Google vision API request failed: {e}")
+            logger.error("Google vision API request failed: %s", e)
             raise ValueError(f"Failed to extract elements: {e}")
 
 
@@ -420,11 +566,11 @@ class AzureOpenAIProvider(BaseLLMProvider):
         
         try:
             url = f"{self.base_url}/openai/deployments/{self.deployment_name}/chat/completions?api-version={self.api_version}"
-            response = self.session.post(url, json=payload, timeout=120)
+            response = self.session.post(url, data=encode_json(payload), timeout=PROVIDER_TIMEOUT)
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            return decode_json(response)["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Azure OpenAI API request failed: {e}")
+            logger.error("Azure OpenAI API request failed: %s", e)
             raise ValueError(f"Failed to generate output: {e}")
     
     def generate_vision(self, prompt: str, image_base64: str, format: str = "json") -> str:
@@ -451,11 +597,11 @@ class AzureOpenAIProvider(BaseLLMProvider):
         
         try:
             url = f"{self.base_url}/openai/deployments/{self.deployment_name}/chat/completions?api-version={self.api_version}"
-            response = self.session.post(url, json=payload, timeout=120)
+            response = self.session.post(url, data=encode_json(payload), timeout=PROVIDER_TIMEOUT)
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            return decode_json(response)["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Azure OpenAI vision API request failed: {e}")
+            logger.error("Azure OpenAI vision API request failed: %s", e)
             raise ValueError(f"Failed to extract elements: {e}")
 
 
@@ -489,12 +635,14 @@ class LLMProvider:
             LLM_MODEL: Default text model
             LLM_VISION_MODEL: Default vision model
             LLM_CODING_MODEL: Default coding model
+            OLLAMA_MODEL, VISION_MODEL, CODING_MODEL: Legacy Ollama equivalents,
+                used when the LLM_* variable is not set
         """
         # Get provider and models from env if not specified
         self.provider_name = (provider or os.getenv("LLM_PROVIDER", "ollama")).lower()
-        self.model = model or os.getenv("LLM_MODEL") or self._get_default_model()
-        self.vision_model = vision_model or os.getenv("LLM_VISION_MODEL") or self.model
-        self.coding_model = coding_model or os.getenv("LLM_CODING_MODEL") or self.model
+        self.model = model or self._env_model("LLM_MODEL", "OLLAMA_MODEL") or self._get_default_model()
+        self.vision_model = vision_model or self._env_model("LLM_VISION_MODEL", "VISION_MODEL") or self.model
+        self.coding_model = coding_model or self._env_model("LLM_CODING_MODEL", "CODING_MODEL") or self.model
         
         if self.provider_name not in self.PROVIDERS:
             raise ValueError(f"Unsupported provider: {self.provider_name}. Supported: {list(self.PROVIDERS.keys())}")
@@ -516,7 +664,22 @@ class LLMProvider:
             self.vision_provider = provider_class(model=self.vision_model, api_key=api_key)
             self.coding_provider = provider_class(model=self.coding_model, api_key=api_key)
         
-        logging.info(f"Initialized LLM provider: {self.provider_name} (model: {self.model})")
+        logger.info("Initialized LLM provider: %s (model: %s)", self.provider_name, self.model)
+    
+    def _env_model(self, name: str, legacy_name: str) -> Optional[str]:
+        """Read a model name from env, falling back to the legacy Ollama variable"""
+        value = os.getenv(name)
+        if not value and self.provider_name == 'ollama':
+            value = os.getenv(legacy_name)
+        return value
+    
+    def preload(self) -> None:
+        """Load the text, vision and coding models ahead of the first request (Ollama only)"""
+        seen = set()
+        for provider in (self.text_provider, self.vision_provider, self.coding_provider):
+            if provider.model not in seen:
+                seen.add(provider.model)
+                provider.preload()
     
     def _get_default_model(self) -> str:
         """Get default model based on provider"""
@@ -561,6 +724,10 @@ class LLMProvider:
         """
         return self.vision_provider.generate_vision(prompt, image_base64, format)
     
+    def preload_coding_model(self) -> None:
+        """Load only the coding model, e.g. while a vision request is still running"""
+        self.coding_provider.preload()
+    
     def generate_code(self, prompt: str, max_tokens: int = 4096, temperature: float = 0.7) -> str:
         """
         Generate code using coding model.
@@ -578,13 +745,17 @@ class LLMProvider:
 
 # Singleton instance for backward compatibility
 _provider_instance: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
 
 
 def get_llm_provider() -> LLMProvider:
-    """Get singleton LLM provider instance"""
+    """Get singleton LLM provider instance (a global read once created)"""
     global _provider_instance
     if _provider_instance is None:
-        _provider_instance = LLMProvider()
+        # LLM calls run in worker threads; only one of them may build the instance
+        with _provider_lock:
+            if _provider_instance is None:
+                _provider_instance = LLMProvider()
     return _provider_instance
 
 
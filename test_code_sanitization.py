@@ -0,0 +1,83 @@
+"""
+Test script to verify generated-code sanitization
+
+Usage:
+    python test_code_sanitization.py
+
+This script needs no LLM or browser and verifies:
+1. Safe Playwright actions pass sanitize_code
+2. Known sandbox escapes are rejected by sanitize_code
+3. The restricted execution globals don't expose the event loop
+"""
+
+import sys
+
+from cua_tools import sanitize_code, RESTRICTED_GLOBALS
+
+SAFE_CODE = (
+    "await page.fill('#email', 'open source')\n"
+    "await asyncio.sleep(1)\n"
+    "await page.click('#submit')\n"
+)
+
+# Payloads that must never reach exec()
+ESCAPES = {
+    "import": "import os\nos.system('echo PWNED')",
+    "asyncio subprocess": "await asyncio.create_subprocess_shell('echo PWNED')",
+    "loop subprocess": (
+        "loop = asyncio.get_running_loop()\n"
+        "await loop.subprocess_shell(asyncio.SubprocessProtocol, 'echo PWNED > /tmp/pwned.txt')"
+    ),
+    "get_event_loop": "asyncio.get_event_loop().subprocess_exec(None, 'sh')",
+    "new_event_loop": "asyncio.new_event_loop()",
+    "dunder": "page.__class__.__init__.__globals__",
+    "private attribute": "page._impl_obj._loop.run_in_executor(None, print)",
+    "format traversal": "'{0.__class__}'.format(page)",
+    "format_map traversal": "'{p.__class__}'.format_map({'p': page})",
+}
+
+
+def test_safe_code_passes():
+    """Plain Playwright actions are returned unchanged"""
+    assert sanitize_code(SAFE_CODE) == SAFE_CODE
+
+
+def test_escapes_rejected():
+    """Every known escape payload raises ValueError"""
+    for name, code in ESCAPES.items():
+        try:
+            sanitize_code(code)
+        except ValueError:
+            continue
+        raise AssertionError(f"sanitize_code accepted {name} payload")
+
+
+def test_restricted_asyncio():
+    """Executed code only gets asyncio.sleep, not the event loop"""
+    restricted_asyncio = RESTRICTED_GLOBALS['asyncio']
+    assert restricted_asyncio.sleep is not None
+    for name in ('get_running_loop', 'get_event_loop', 'new_event_loop', 'create_subprocess_shell'):
+        assert not hasattr(restricted_asyncio, name), name
+
+
+def main():
+    """Run all tests"""
+    tests = [
+        ("Safe code", test_safe_code_passes),
+        ("Escape payloads", test_escapes_rejected),
+        ("Restricted asyncio", test_restricted_asyncio),
+    ]
+
+    all_passed = True
+    for test_name, test in tests:
+        try:
+            test()
+            print(f"✓ PASS: {test_name}")
+        except AssertionError as e:
+            all_passed = False
+            print(f"✗ FAIL: {test_name} {e}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
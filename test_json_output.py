@@ -1,10 +1,16 @@
 import os
 import asyncio
+import logging
 from dotenv import load_dotenv
 from cua_tools import generate_nfr_tests, generate_functional_tests
 
 load_dotenv()
 
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
 async def test_json_generation():
     """Test that JSON output is valid and complete."""
     